@@ -0,0 +1,61 @@
+"""
+Album-art analysis: the previous two-decode, per-pixel-Python pipeline versus
+core.get_album_art_matrix (one drafted decode, buffer-level histogram).
+
+Runs against a synthetic 1280x720 JPEG (maxresdefault size) with a noisy
+gradient, so there are plenty of distinct colors to count.
+
+    python benchmarks/bench_art_pipeline.py [iterations]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageFilter
+import core
+
+warnings.simplefilter("ignore", DeprecationWarning)   # getdata() in the old path
+
+
+def old_dominant(path):
+    im = Image.open(path).convert("RGB").resize((50, 50))
+    counts = {}
+    for r, g, b in list(im.getdata()):
+        if 30 < (r + g + b) < 700:
+            counts[(r, g, b)] = counts.get((r, g, b), 0) + 1
+    return max(counts, key=counts.get) if counts else (214, 214, 214)
+
+
+def old_matrix(path, size):
+    im = Image.open(path).convert("RGB").resize((size, size), Image.Resampling.LANCZOS)
+    return list(im.getdata()), size, size, old_dominant(path)
+
+
+def make_cover(path):
+    noise = Image.effect_noise((1280, 720), 64).convert("RGB")
+    grad  = Image.linear_gradient("L").resize((1280, 720)).convert("RGB")
+    Image.blend(grad, noise, 0.5).filter(ImageFilter.SMOOTH).save(path, quality=90)
+
+
+def bench(fn, path, size, n):
+    fn(path, size)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(path, size)
+    return (time.perf_counter() - t0) / n * 1000
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "cover.jpg")
+        make_cover(path)
+        for size in (36, 64):
+            a = bench(old_matrix, path, size, n)
+            b = bench(core.get_album_art_matrix, path, size, n)
+            print(f"size {size:3}  old {a:7.2f} ms   new {b:7.2f} ms   ({a / b:.1f}x)")
@@ -0,0 +1,74 @@
+"""
+mpv IPC throughput against a local fake mpv socket server.
+
+Compares one-at-a-time round trips (what every call used to cost) with
+pipelined requests matched back by request_id, and checks that a steady
+stream of async events interleaved with replies doesn't confuse the
+demultiplexer.
+
+    python benchmarks/bench_mpv_ipc.py [commands]
+"""
+
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import player
+
+
+def fake_mpv(path, ready):
+    """Reply to every command like mpv would, with a property event between replies."""
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    srv.bind(path)
+    srv.listen()
+    ready.set()
+    conn, _ = srv.accept()
+    out = conn.makefile("wb")
+    for i, line in enumerate(conn.makefile("rb")):
+        msg = json.loads(line)
+        if i % 4 == 0:
+            out.write(b'{"event":"property-change","id":1,"name":"time-pos","data":%d}\n' % i)
+        out.write(json.dumps({"request_id": msg.get("request_id"), "error": "success",
+                              "data": msg["command"][-1]}).encode() + b"\n")
+        out.flush()
+
+
+class _Alive:
+    def poll(self):
+        return None
+
+
+def main(n):
+    path  = os.path.join(tempfile.mkdtemp(), "mpv.sock")
+    ready = threading.Event()
+    threading.Thread(target=fake_mpv, args=(path, ready), daemon=True).start()
+    ready.wait()
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    player._mpv_process = _Alive()
+    player._attach(sock)
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        assert player._send_command({"command": ["get_property", i]})["data"] == i
+    serial = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    futures = [player.command_async("get_property", i) for i in range(n)]
+    assert [f.result(5)["data"] for f in futures] == list(range(n))
+    pipelined = time.perf_counter() - t0
+
+    print(f"round trip  {n / serial:10,.0f} cmd/s   ({serial / n * 1e6:6.1f} µs/cmd)")
+    print(f"pipelined   {n / pipelined:10,.0f} cmd/s   ({pipelined / n * 1e6:6.1f} µs/cmd)")
+    print(f"time-pos from events: {player.get_position()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,86 @@
+"""
+Queue and shuffle-pool operations at 10k and 100k tracks.
+
+Compares the old list-of-dicts queue with a list shuffle pool (pop(0),
+list.remove, `in` per visible row, random insert) against TrackList and
+ShufflePool, and reports per-track memory for both queue layouts.
+
+    python benchmarks/bench_queue.py [sizes...]
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playlist import TrackList, ShufflePool
+
+ROWS = 40  # visible queue rows checked for "played" on each of 100 redraws
+
+
+def fake_tracks(n):
+    return [{"title": f"Artist {i % 997} - Song number {i}",
+             "url": f"https://www.youtube.com/watch?v={i:011d}"} for i in range(n)]
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1e3
+
+
+def queue_bytes(build):
+    tracemalloc.start()
+    q = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del q
+    return size
+
+
+def old_ops(n, ops):
+    pool = list(range(n))
+    random.shuffle(pool)
+    drop = random.sample(range(n), ops)
+    return {
+        "pop":    timed(lambda: [pool.pop(0) for _ in range(ops)]),
+        "remove": timed(lambda: [pool.remove(i) for i in drop if i in pool]),
+        "rows":   timed(lambda: [[i in pool for i in range(r, r + ROWS)]
+                                 for r in range(0, n, n // 100)]),
+        "insert": timed(lambda: [pool.insert(random.randint(0, len(pool)), n + i)
+                                 for i in range(ops)]),
+    }
+
+
+def new_ops(n, ops):
+    pool = ShufflePool()
+    pool.reset(n)
+    drop = random.sample(range(n), ops)
+    return {
+        "pop":    timed(lambda: [pool.pop() for _ in range(ops)]),
+        "remove": timed(lambda: [pool.discard(i) for i in drop]),
+        "rows":   timed(lambda: [[i in pool for i in range(r, r + ROWS)]
+                                 for r in range(0, n, n // 100)]),
+        "insert": timed(lambda: [pool.add(n + i) for i in range(ops)]),
+    }
+
+
+def main(sizes):
+    ops = 1000
+    for n in sizes:
+        tracks = fake_tracks(n)
+        old_mem = queue_bytes(lambda: [dict(t) for t in tracks])
+        new_mem = queue_bytes(lambda: TrackList(tracks))
+        old, new = old_ops(n, ops), new_ops(n, ops)
+        print(f"── {n:,} tracks, {ops} ops each ──")
+        for k in old:
+            print(f"  {k:7s} list {old[k]:9.2f} ms   pool {new[k]:7.2f} ms   "
+                  f"{old[k] / max(new[k], 1e-6):7.1f}x")
+        print(f"  queue   dicts {old_mem / n:6.0f} B/track   columns {new_mem / n:6.0f} B/track")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,78 @@
+"""
+Per-keystroke search latency over a synthetic queue of 50k titles.
+
+Builds the index in playlist-sized batches (as the queue streams in), then
+types a handful of queries one character at a time and reports the median
+and worst latency per keystroke, against a plain substring scan.
+
+    python benchmarks/bench_search.py [titles]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+from search import TitleIndex, normalize
+
+QUERIES = ["queen bohemian", "the love", "daft punk around", "a", "remix 2019",
+           "lofi hip hop beats", "bohemain rapsody", "xq"]
+
+
+def fake_titles(n, seed=1):
+    rnd   = random.Random(seed)
+    vocab = [w for w in ("the love night dance queen heart fire rain city dream "
+                         "remix live official video lofi hip hop beats daft punk "
+                         "around world summer blue bohemian rhapsody acoustic "
+                         "version feat radio edit lyrics 2019 2020 2021").split()]
+    vocab += ["".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(3, 9)))
+              for _ in range(4000)]
+    return [" ".join(rnd.choice(vocab) for _ in range(rnd.randint(3, 8))) + f" - {i}"
+            for i in range(n)]
+
+
+def typing(fn, query):
+    lat = []
+    for end in range(1, len(query) + 1):
+        t0 = time.perf_counter()
+        fn(query[:end])
+        lat.append((time.perf_counter() - t0) * 1e3)
+    return lat
+
+
+def main(n):
+    titles = fake_titles(n)
+
+    index = TitleIndex()
+    t0 = time.perf_counter()
+    for i in range(0, n, core.MEDIA_BATCH):
+        index.extend(titles[i:i + core.MEDIA_BATCH])
+    build = time.perf_counter() - t0
+    print(f"index build  {n:,} titles in {build * 1e3:.0f} ms "
+          f"({build / (n / core.MEDIA_BATCH) * 1e3:.2f} ms per {core.MEDIA_BATCH}-track batch)")
+
+    norms = [normalize(t) for t in titles]
+
+    def scan(q):
+        q = normalize(q).strip()
+        return [i for i, t in enumerate(norms) if q in t][:200]
+
+    idx_all, scan_all = [], []
+    for q in QUERIES:
+        lat  = typing(index.search, q)
+        slat = typing(scan, q)
+        idx_all += lat
+        scan_all += slat
+        print(f"  {q!r:22} index med {statistics.median(lat):5.2f} max {max(lat):5.2f} ms   "
+              f"scan med {statistics.median(slat):5.2f} ms   hits {len(index.search(q))}")
+    print(f"per keystroke  index median {statistics.median(idx_all):.2f} ms, "
+          f"p95 {sorted(idx_all)[int(len(idx_all) * .95)]:.2f} ms, max {max(idx_all):.2f} ms;  "
+          f"scan median {statistics.median(scan_all):.2f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,70 @@
+"""
+Wall time to build one queue from several sources through
+core.stream_sources(), one worker at a time vs SOURCE_WORKERS in parallel.
+
+Real extraction needs the network, so each source is a stand-in worker that
+sleeps for its "page fetch" time and emits a playlist with some videos shared
+between sources (dropped by the merge).
+
+    python benchmarks/bench_sources.py [sources]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+TRACKS = 300
+
+
+def fake_worker(url, feed):
+    """Stand-in for core._stream_media_worker: "<name>:<seconds>"."""
+    name, delay = url.split(":")
+    feed.put(("tracks", [{"title": f"{name} 0", "url": f"https://youtu.be/{name}-0"}]))
+    time.sleep(float(delay))
+    # Every fifth video also appears in every other source
+    batch = [{"title": f"{name} {i}",
+              "url": f"https://youtu.be/{'shared' if i % 5 == 0 else name}-{i}"}
+             for i in range(1, TRACKS)]
+    for i in range(0, len(batch), core.MEDIA_BATCH):
+        feed.put(("tracks", batch[i:i + core.MEDIA_BATCH]))
+    feed.put(("done", TRACKS))
+
+
+core._stream_media_worker = fake_worker   # re-applied in spawned children on import
+core.save_snapshot        = lambda url, tracks: None   # keep fake playlists out of the user's cache
+
+
+def drain(feed):
+    tracks = 0
+    while True:
+        kind, payload = feed.get()
+        if kind == "tracks":
+            tracks += len(payload)
+        elif kind in ("done", "error"):
+            return tracks
+
+
+def main(n):
+    urls = [f"src{i}:{0.5 + (i % 4) * 0.5}" for i in range(n)]
+    slowest = max(float(u.split(":")[1]) for u in urls)
+
+    t0 = time.perf_counter()
+    serial = drain(core.stream_sources(urls, workers=1))
+    t_serial = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    merged = drain(core.stream_sources(urls))
+    t_merged = time.perf_counter() - t0
+
+    print(f"{n} sources, slowest {slowest:.1f} s, sum {sum(float(u.split(':')[1]) for u in urls):.1f} s")
+    print(f"  one at a time  {t_serial:5.1f} s   {serial:,} tracks after dedup")
+    print(f"  stream_sources {t_merged:5.1f} s   {merged:,} tracks after dedup "
+          f"({core.SOURCE_WORKERS} workers)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
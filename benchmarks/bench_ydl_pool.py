@@ -0,0 +1,44 @@
+"""
+Per-call YoutubeDL overhead: a fresh instance per call (the old behaviour of
+resolve_stream and playlist extraction) versus borrowing from core's pool.
+
+Only the setup cost is measured — each call instantiates the YouTube
+extractor but does no network I/O.
+
+    python benchmarks/bench_ydl_pool.py [calls]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+import core
+
+
+def fresh(profile):
+    with yt_dlp.YoutubeDL({**core._PROFILES[profile], "logger": core._NullLogger()}) as ydl:
+        ydl.get_info_extractor("Youtube")
+
+
+def pooled(profile):
+    with core.borrow_ydl(profile) as ydl:
+        ydl.get_info_extractor("Youtube")
+
+
+def bench(fn, profile, calls):
+    fn(profile)   # warm imports / pool
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn(profile)
+    return (time.perf_counter() - t0) / calls * 1000
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    for profile in core._PROFILES:
+        a = bench(fresh, profile, calls)
+        b = bench(pooled, profile, calls)
+        print(f"{profile:6}  fresh {a:8.3f} ms/call   pooled {b:8.3f} ms/call   ({a / b:,.0f}x)")
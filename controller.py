@@ -0,0 +1,480 @@
+"""
+Queue and playback logic shared by the curses UI and the headless daemon.
+"""
+
+import queue
+import time
+
+import core
+import player
+import session
+from playlist import TrackList, ShufflePool
+from search import TitleIndex
+
+PREFETCH_AHEAD = 2  # upcoming tracks resolved in the background
+
+# mpv events that can change what the controller does or the screen shows
+WAKE_EVENTS = ("start-file", "end-file", "file-loaded", "idle")
+WAKE_PROPS  = ("idle-active", "playlist-pos", "duration")
+
+
+def is_wake_event(msg):
+    """True for mpv events worth waking an event loop for (not time-pos ticks)."""
+    event = msg.get("event")
+    return event in WAKE_EVENTS or (event == "property-change" and msg.get("name") in WAKE_PROPS)
+
+
+# ─── State ────────────────────────────────────────────────────────────────────
+class State:
+    def __init__(self):
+        self.queue          = TrackList()
+        self.queue_version  = 0      # bumped whenever the queue's contents change
+        self.shuffle_pool   = ShufflePool()  # remaining unplayed indices for true shuffle
+        self.history        = []
+        self.current_idx    = 0
+        self.volume         = 70
+        self.paused         = False
+        self.repeat         = False
+        self.shuffle        = False
+        self.muted          = False
+        self.view           = "player"
+        self.queue_offset   = 0
+        self.loading        = False  # playlist entries still streaming in
+        self.queued_idx     = None   # track appended to mpv's playlist for gapless
+        self.source_urls    = []
+        self.sources        = []     # [state, count] per entered URL
+        self.refreshing     = False  # showing a saved snapshot while re-enumerating
+        self.index          = TitleIndex()
+        self.search         = None   # query while the `/` prompt is open
+        self.hits           = []
+        self.hit_sel        = 0
+        self._status_msg    = ""
+        self._status_ts     = 0
+        self.spin_idx       = 0
+        self.pulse_idx      = 0
+
+    def set_status(self, msg, ttl=3.0):
+        self._status_msg = msg
+        self._status_ts  = time.time() + ttl
+
+    def get_status(self):
+        return self._status_msg if time.time() < self._status_ts else ""
+
+    def reset_shuffle_pool(self):
+        """Rebuild the shuffle pool excluding the current track."""
+        self.shuffle_pool.reset(len(self.queue), exclude=self.current_idx)
+
+    def extend_queue(self, tracks):
+        """Append newly ingested tracks; in shuffle mode they join the pool."""
+        start = len(self.queue)
+        self.queue.extend(tracks)
+        self.queue_version += 1
+        if self.shuffle:
+            for idx in range(start, len(self.queue)):
+                self.shuffle_pool.add(idx)
+
+    def refresh_queue(self, tracks):
+        """
+        Swap in a re-enumerated queue without touching the current track.
+        History, shuffle pool and gapless target follow their tracks by video
+        id; repeats of one id are paired up in order, so the mapping stays
+        one-to-one. Returns (added, removed).
+        """
+        def key(url):
+            return core.video_id(url) or url
+
+        old = [key(u) for u in self.queue.urls]
+        new = [key(t["url"]) for t in tracks]
+        if new[:len(old)] == old:
+            self.extend_queue(tracks[len(old):])
+            return len(new) - len(old), 0
+
+        if old and old[self.current_idx] not in set(new):
+            # Removed upstream while playing: keep it in place until it ends
+            pos    = min(self.current_idx, len(tracks))
+            tracks = tracks[:pos] + [self.queue[self.current_idx]._asdict()] + tracks[pos:]
+            new.insert(pos, old[self.current_idx])
+
+        where = {}
+        for i, k in enumerate(new):
+            where.setdefault(k, []).append(i)
+        mapping = {}
+        for i, k in enumerate(old):
+            if where.get(k):
+                mapping[i] = where[k].pop(0)
+        taken = set(mapping.values())
+        added = [i for i in range(len(new)) if i not in taken]
+
+        self.queue = TrackList(tracks)
+        self.queue_version += 1
+        self.index = TitleIndex()
+        self.current_idx  = mapping.get(self.current_idx, 0)
+        self.history      = [mapping[i] for i in self.history if i in mapping]
+        self.queued_idx   = mapping.get(self.queued_idx)
+        self.queue_offset = min(self.queue_offset, len(self.queue) - 1)
+        if self.shuffle:
+            self.shuffle_pool.remap(mapping, len(self.queue))
+            for idx in added:
+                self.shuffle_pool.add(idx)
+        if self.search:
+            self.run_search()
+        return len(added), len(old) - len(mapping)
+
+    def remove_track(self, idx):
+        """Delete queue entry `idx`, renumbering everything that points past it."""
+        def shift(i):
+            return i - 1 if i > idx else i
+
+        del self.queue[idx]
+        self.queue_version += 1
+        self.index          = TitleIndex()
+        self.current_idx    = shift(self.current_idx)
+        self.history        = [shift(i) for i in self.history if i != idx]
+        self.queued_idx     = None if self.queued_idx in (None, idx) else shift(self.queued_idx)
+        self.queue_offset   = min(self.queue_offset, len(self.queue) - 1)
+        if self.shuffle:
+            self.shuffle_pool.remap(
+                {i: shift(i) for i in self.shuffle_pool.dump() if i != idx}, len(self.queue)
+            )
+        if self.search:
+            self.run_search()
+
+    def next_idx(self):
+        if not self.queue:
+            return 0
+        if self.shuffle:
+            # True no-repeat shuffle: drain pool, refill when empty
+            if not self.shuffle_pool:
+                self.reset_shuffle_pool()
+            if self.shuffle_pool:
+                return self.shuffle_pool.pop()
+            return self.current_idx
+        return (self.current_idx + 1) % len(self.queue)
+
+    def peek_next(self):
+        """What next_idx() would return, without consuming the shuffle pool."""
+        if not self.queue:
+            return None
+        if self.shuffle:
+            if not self.shuffle_pool:
+                self.reset_shuffle_pool()
+            return self.shuffle_pool.peek() if self.shuffle_pool else self.current_idx
+        return (self.current_idx + 1) % len(self.queue)
+
+    def auto_next(self):
+        """The track that plays when the current one ends on its own."""
+        return self.current_idx if self.repeat else self.peek_next()
+
+    def upcoming(self, n=PREFETCH_AHEAD):
+        """Indices that next_idx()/repeat are about to hand out, without consuming them."""
+        if not self.queue:
+            return []
+        picks = [self.current_idx] if self.repeat else []
+        if self.shuffle:
+            picks += self.shuffle_pool.head(n)
+        else:
+            picks += [(self.current_idx + i) % len(self.queue) for i in range(1, n + 1)]
+        return list(dict.fromkeys(picks))
+
+    def note_source(self, progress, offset=0):
+        """Apply a ("source", progress) message from a feed whose first source is `offset`."""
+        idx, state, count, detail = progress
+        idx += offset
+        self.sources[idx] = [state, count]
+        if state == "error" and len(self.sources) > 1:
+            self.set_status(f"✕  source {idx+1}: {detail}")
+
+    def run_search(self):
+        # The index catches up lazily, so bulk loads never pay for it up front
+        if len(self.index) < len(self.queue):
+            self.index.extend(self.queue.titles[len(self.index):])
+        self.hits    = self.index.search(self.search) if self.search else []
+        self.hit_sel = 0
+
+
+# ─── Controller ───────────────────────────────────────────────────────────────
+
+class Controller:
+    """
+    Drives a State and the player: playlist feeds, track switches, gapless
+    queueing and end-of-track handling. The UI and the daemon call tick()
+    whenever mpv, the user or a background task has something to say.
+    """
+
+    def __init__(self, st, on_enter=None, notify=None):
+        self.st        = st
+        self.on_enter  = on_enter   # fn(track) when a track becomes current
+        self.notify    = notify     # fn() from any thread when a feed or switch has news
+        self.feeds     = []         # (feed, first source index, source count)
+        self.refreshed = []         # fresh enumeration, applied as one diff once complete
+        self.appended  = []         # tracks other feeds added meanwhile, kept by the diff
+        self.last_pos  = None
+        self.retried   = None       # track index already re-resolved after a stream failure
+        self.failed    = False      # mpv reported a stream error not yet handled (e.g. while paused)
+        self.saved_at  = time.time()
+        if notify:
+            player.set_switch_listener(notify)
+
+    # ── Loading ──────────────────────────────────────────────────────────────
+
+    def _add_feed(self, sources):
+        st   = self.st
+        feed = core.stream_sources(sources, notify=self.notify)
+        self.feeds.append((feed, len(st.sources), len(sources)))
+        st.source_urls = st.source_urls + sources
+        st.sources     = st.sources + [["loading", 0] for _ in sources]
+        st.loading     = True
+        return feed
+
+    def open_sources(self, sources):
+        """
+        Start loading `sources` into an empty queue. A saved snapshot is shown
+        straight away and refreshed in the background; otherwise only the
+        first entry is waited for. Returns an error message, or None once
+        there is something to play.
+        """
+        st    = self.st
+        feed  = self._add_feed(sources)
+        saved = core.load_snapshots(sources)
+        if saved:
+            kind, payload = "tracks", saved
+            st.refreshing = True
+        else:
+            kind = "source"
+        while kind == "source":
+            try:
+                kind, payload = feed.get(timeout=core.MEDIA_TIMEOUT)
+            except queue.Empty:
+                kind, payload = "error", "timed out"
+            if kind == "source":
+                st.note_source(payload)
+
+        if kind != "tracks" or not payload:
+            self.feeds.clear()
+            st.loading = False
+            return payload if kind == "error" else "nothing to play"
+
+        st.extend_queue(payload)
+        st.reset_shuffle_pool()
+        return None
+
+    def add_sources(self, sources):
+        """Append `sources` to the queue as they are enumerated."""
+        self._add_feed(sources)
+
+    def restore(self, data):
+        """Load a session from session.load() into the still-empty state."""
+        session.restore(self.st, data)
+        player.set_volume(self.st.volume)
+        if self.st.muted:
+            player.toggle_mute()
+
+    def drain_feed(self):
+        st, grew = self.st, False
+        for entry in list(self.feeds):
+            feed, offset, count = entry
+            refreshing = st.refreshing and offset == 0
+            while True:
+                try:
+                    kind, payload = feed.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "tracks":
+                    if refreshing:
+                        self.refreshed.extend(payload)
+                    else:
+                        st.extend_queue(payload)
+                        grew = True
+                        if st.refreshing:
+                            self.appended.extend(payload)
+                    continue
+                if kind == "source":
+                    st.note_source(payload, offset)
+                    continue
+
+                self.feeds.remove(entry)
+                if refreshing:
+                    st.refreshing = False
+                    mine = st.sources[offset:offset + count]
+                    if kind == "done" and all(state == "done" for state, _ in mine):
+                        added, removed = st.refresh_queue(self.refreshed + self.appended)
+                        if added or removed:
+                            st.set_status(f"↻  playlist updated  +{added} −{removed}")
+                            grew = True
+                    else:
+                        st.set_status("✕  refresh failed, playing the saved playlist")
+                    self.refreshed, self.appended = [], []
+                elif kind == "error":
+                    st.set_status(f"✕  playlist stopped loading: {payload}")
+                break
+        st.loading = bool(self.feeds)
+        if grew:
+            self.prefetch_upcoming()
+
+    # ── Transport ────────────────────────────────────────────────────────────
+
+    def enter_track(self, idx, push=True):
+        """Bookkeeping for `idx` becoming the current track."""
+        st = self.st
+        if push and st.current_idx != idx:
+            st.history.append(st.current_idx)
+        st.current_idx = idx
+        st.shuffle_pool.discard(idx)
+        st.paused = False
+        if self.on_enter:
+            self.on_enter(st.queue[idx])
+        self.prefetch_upcoming()
+
+    def start_track(self, idx, push=True, start=None):
+        """Switch to `idx` without waiting on resolution; the newest switch wins."""
+        self.st.queued_idx = None
+        self.failed        = False
+        self.enter_track(idx, push)
+        player.request_play(self.st.queue.urls[idx], start)
+
+    def next(self):
+        st = self.st
+        # Jump to the appended entry when it is the right one
+        if st.repeat or st.queued_idx != st.peek_next() or not player.play_next():
+            self.start_track(st.next_idx())
+        else:
+            idx, st.queued_idx = st.queued_idx, None
+            self.retried = None
+            self.enter_track(idx)
+
+    def back(self):
+        st = self.st
+        if st.history:
+            self.start_track(st.history.pop(), push=False)
+        elif st.current_idx > 0:
+            self.start_track(st.current_idx - 1)
+
+    def pause(self):
+        player.pause_stream()
+        self.st.paused = True
+
+    def resume(self):
+        player.resume_stream()
+        self.st.paused = False
+
+    def seek(self, seconds):
+        player.seek(seconds)
+
+    def set_volume(self, value):
+        self.st.volume = max(0, min(100, int(value)))
+        player.set_volume(self.st.volume)
+
+    def toggle_mute(self):
+        self.st.muted = player.toggle_mute()
+        return self.st.muted
+
+    def toggle_shuffle(self):
+        st = self.st
+        st.shuffle = not st.shuffle
+        if st.shuffle:
+            st.reset_shuffle_pool()
+        else:
+            st.shuffle_pool.clear()
+        self.prefetch_upcoming()
+        return st.shuffle
+
+    def toggle_repeat(self):
+        self.st.repeat = not self.st.repeat
+        self.prefetch_upcoming()
+        return self.st.repeat
+
+    def remove(self, idx):
+        """Drop queue entry `idx`; the current track can't be removed. True on success."""
+        st = self.st
+        if idx == st.current_idx or not 0 <= idx < len(st.queue):
+            return False
+        st.remove_track(idx)
+        self.prefetch_upcoming()
+        return True
+
+    def sync_gapless(self):
+        """Keep the auto-advance target appended in mpv once it is resolved."""
+        st     = self.st
+        target = st.auto_next()
+        if target is None or target == st.queued_idx:
+            return
+        url    = st.queue.urls[target]
+        stream = core.ready_stream(url)
+        if stream:
+            player.queue_next(url, stream)
+            st.queued_idx = target   # even on failure: eof then falls back to loadfile
+
+    def prefetch_upcoming(self):
+        st   = self.st
+        urls = [st.queue.urls[i] for i in st.upcoming()]
+        core.prefetch(urls)
+        core.cache_audio([st.queue.urls[st.current_idx]] + urls)
+
+    # ── Housekeeping ─────────────────────────────────────────────────────────
+
+    def tick(self):
+        """Catch up with the feeds and mpv. Returns (position, duration)."""
+        st = self.st
+        self.drain_feed()
+
+        running = player.is_running()
+        pos     = player.get_position()
+        dur     = player.get_duration()
+        ended   = player.take_end_reason()
+        moved   = player.take_advanced()
+        sw_err  = player.take_switch_error()
+        busy    = player.switch_pending()
+        if sw_err:
+            st.set_status(f"✕  {sw_err}")
+        if pos is not None:
+            self.last_pos = pos
+        if ended == "error":
+            self.failed = True     # kept until playback resumes
+
+        # mpv moved on to the appended entry by itself: gapless advance
+        if moved is not None and st.queued_idx is not None \
+                and st.queue.urls[st.queued_idx] == moved:
+            idx, st.queued_idx = st.queued_idx, None
+            self.retried = None
+            self.enter_track(idx, push=not st.repeat)
+
+        # Auto-advance on mpv's own end-of-file (nothing was queued). While a
+        # switch is in flight the old track ending is irrelevant.
+        if busy:
+            pass
+        elif ended == "eof" and st.queue:
+            self.retried = None
+            self.start_track(
+                st.current_idx if st.repeat else st.next_idx(),
+                push=not st.repeat
+            )
+        elif (self.failed or (not running and self.last_pos is not None)) \
+                and not st.paused and st.queue:
+            # The stream failed or mpv died mid-track: most likely the URL
+            # expired (403) while paused, so re-resolve once and resume.
+            url    = st.queue.urls[st.current_idx]
+            failed = self.failed or core.stream_expired(url)
+            if failed and self.retried != st.current_idx:
+                self.retried = st.current_idx
+                core.invalidate_stream(url)
+                st.set_status("↻  stream expired, re-resolving…")
+                self.start_track(st.current_idx, push=False, start=self.last_pos)
+            else:
+                self.start_track(st.next_idx())
+            self.last_pos = None
+
+        if running and st.queue and not busy:
+            self.sync_gapless()
+
+        if time.time() - self.saved_at > session.SAVE_INTERVAL:
+            self.save()
+        return pos, dur
+
+    def save(self):
+        session.save(self.st, player.get_position() or self.last_pos)
+        self.saved_at = time.time()
+
+    def close(self):
+        self.save()
+        player.stop_stream()
+        core.shutdown_workers()
@@ -1,5 +1,19 @@
 import os
+import re
+import json
+import time
+import struct
+import hashlib
+import tempfile
+import collections
+import urllib.parse
+import threading
+import atexit
+import signal
 import contextlib
+import multiprocessing
+import queue
+import concurrent.futures
 import yt_dlp
 import requests
 from PIL import Image
@@ -29,123 +43,1098 @@ _BASE_OPTS = {
 }
 
 
-# ─── Stream Resolution ────────────────────────────────────────────────────────
+# ─── Latest-Wins Worker ───────────────────────────────────────────────────────
 
-def resolve_stream(url):
-    url  = normalize_youtube_url(url)
-    opts = {
+class LatestOnly:
+    """
+    Background worker that runs fn(gen, *args) for the most recent submit()
+    only. Submissions made while fn is busy are coalesced into the newest
+    one, and fn can ask is_current(gen) before applying a stale result.
+    `on_done`, if set, is called from the worker after each job.
+    """
+
+    def __init__(self, fn):
+        self._fn     = fn
+        self._cond   = threading.Condition()
+        self._job    = None
+        self._busy   = False
+        self._thread = None
+        self.gen     = 0
+        self.on_done = None
+
+    def submit(self, *args):
+        with self._cond:
+            self.gen += 1
+            self._job = (self.gen, args)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return self.gen
+
+    def is_current(self, gen):
+        return gen == self.gen
+
+    def busy(self):
+        """True while a job is queued or running."""
+        with self._cond:
+            return self._busy or self._job is not None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._job is None:
+                    self._cond.wait()
+                (gen, args), self._job = self._job, None
+                self._busy = True
+            try:
+                self._fn(gen, *args)
+            except Exception:
+                pass
+            finally:
+                with self._cond:
+                    self._busy = False
+            if self.on_done:
+                self.on_done()
+
+
+# ─── YoutubeDL Pool ───────────────────────────────────────────────────────────
+# Constructing a YoutubeDL parses options, loads extractors and sets up the
+# cookie jar and JS components, so long-lived instances are kept per option
+# profile and lent out to one caller at a time.
+
+class _NullLogger:
+    def debug(self, msg):   pass
+    def info(self, msg):    pass
+    def warning(self, msg): pass
+    def error(self, msg):   pass
+
+
+_PROFILES = {
+    "track": {
         **_BASE_OPTS,
         "format":              "bestaudio/best",
         "extract_flat":        False,
         "allow_unplayable_formats": True,
-    }
+    },
+    "flat": {**_BASE_OPTS, "skip_download": True, "extract_flat": True},
+}
+
+YDL_POOL_SIZE = 4   # idle instances kept per profile
+
+_ydl_pool_lock = threading.Lock()
+_ydl_pool      = {}   # profile -> [idle YoutubeDL]
+
+
+def _new_ydl(profile):
+    ydl = yt_dlp.YoutubeDL({**_PROFILES[profile], "logger": _NullLogger()})
+    ydl.get_info_extractor("Youtube")   # instantiate the extractor up front
+    return ydl
+
+
+@contextlib.contextmanager
+def borrow_ydl(profile):
+    """Lend out an idle YoutubeDL for `profile`, creating one if none is free."""
+    with _ydl_pool_lock:
+        idle = _ydl_pool.setdefault(profile, [])
+        ydl  = idle.pop() if idle else None
+    if ydl is None:
+        ydl = _new_ydl(profile)
 
     try:
-        with open(os.devnull, "w") as devnull:
-            with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
-                with yt_dlp.YoutubeDL(opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
+        yield ydl
+    finally:
+        with _ydl_pool_lock:
+            if len(idle) < YDL_POOL_SIZE:
+                idle.append(ydl)
+                ydl = None
+        if ydl is not None:
+            ydl.close()
+
+
+def warm_ydl_pool(profiles=("track", "flat")):
+    """Pre-create one instance per profile; meant to run in a background thread."""
+    for profile in profiles:
+        try:
+            ydl = _new_ydl(profile)
+        except Exception:
+            continue
+        with _ydl_pool_lock:
+            _ydl_pool.setdefault(profile, []).append(ydl)
+
+
+@atexit.register
+def _close_ydl_pool():
+    with _ydl_pool_lock:
+        pool = [y for idle in _ydl_pool.values() for y in idle]
+        _ydl_pool.clear()
+    for ydl in pool:
+        try:
+            ydl.close()
+        except Exception:
+            pass
+
+
+# ─── Extraction Workers ───────────────────────────────────────────────────────
+# yt_dlp extraction (and the ejs challenge solver) is CPU-heavy Python, so it
+# runs in a small process pool and hands back plain dicts; the UI process only
+# ever waits on futures and never competes with it for the GIL.
+
+EXTRACT_WORKERS = 2
+EXTRACT_TIMEOUT = 30    # seconds for a single track
+MEDIA_TIMEOUT   = 180   # seconds for a whole playlist
+
+_executor_lock = threading.Lock()
+_executor      = None
 
-        return info.get("title"), info.get("duration"), info.get("url")
+
+def _silence_worker():
+    # Workers share the terminal with curses: keep them silent, and leave
+    # Ctrl+C to the UI process.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+
+def _worker_init():
+    _silence_worker()
+    warm_ydl_pool(("track",))   # "flat" runs in a fresh process per source instead
+
+
+def _ping():
+    return True
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_worker_init,
+            )
+        return _executor
+
+
+def _discard_executor(executor):
+    """Tear down `executor`, killing workers stuck in a hung extraction."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    for proc in list((getattr(executor, "_processes", None) or {}).values()):
+        try:
+            proc.terminate()
+        except Exception:
+            pass
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def start_workers():
+    """Spawn and warm the extraction workers without blocking."""
+    try:
+        executor = _get_executor()
+        for _ in range(EXTRACT_WORKERS):
+            executor.submit(_ping)
+    except Exception:
+        pass
+
+
+def shutdown_workers():
+    with _executor_lock:
+        executor = _executor
+    if executor is not None:
+        _discard_executor(executor)
+
+
+def run_extraction(fn, *args, timeout=EXTRACT_TIMEOUT):
+    """Run `fn(*args)` in the worker pool, returning None on failure or timeout."""
+    try:
+        executor = _get_executor()
+        future   = executor.submit(fn, *args)
     except Exception:
+        return fn(*args)    # no usable process pool here; extract in-process
+
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        if not future.cancel():
+            _discard_executor(executor)
+    except concurrent.futures.process.BrokenProcessPool:
+        _discard_executor(executor)
+    except Exception:
+        pass
+    return None
+
+
+# ─── Video IDs ────────────────────────────────────────────────────────────────
+
+def video_id(url):
+    """Best-effort YouTube video id for `url`, or None if it can't be found."""
+    try:
+        parts = urllib.parse.urlparse(url)
+    except ValueError:
         return None
+    if parts.hostname and parts.hostname.endswith("youtu.be"):
+        return parts.path.strip("/").split("/")[0] or None
+    query = urllib.parse.parse_qs(parts.query)
+    if query.get("v"):
+        return query["v"][0]
+    segs = parts.path.strip("/").split("/")
+    if len(segs) >= 2 and segs[0] in ("shorts", "embed", "live", "v"):
+        return segs[1]
+    return None
+
+
+# ─── Stream Cache ─────────────────────────────────────────────────────────────
+# Resolved track records are persisted per video id together with the expiry
+# that googlevideo embeds in the stream URL, so replays within the URL
+# lifetime skip yt_dlp entirely.
+
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "musicalterm",
+)
+STREAM_CACHE_PATH     = os.path.join(CACHE_DIR, "streams.json")
+STREAM_REFRESH_MARGIN = 600    # treat entries as stale this long before expiry
+STREAM_DEFAULT_TTL    = 3600   # for URLs that carry no expire parameter
 
+_stream_lock  = threading.Lock()
+_stream_cache = None           # cache key -> track record (see resolve_track)
 
-# ─── Playlist / Single Extraction ────────────────────────────────────────────
 
-def extract_media(url):
+def _cache_key(url):
+    return video_id(url) or normalize_youtube_url(url)
+
+
+def _url_expiry(stream_url):
+    """Unix expiry embedded in a googlevideo URL (query or path form), or None."""
+    try:
+        parts = urllib.parse.urlparse(stream_url)
+        query = urllib.parse.parse_qs(parts.query)
+        if query.get("expire"):
+            return int(query["expire"][0])
+        segs = parts.path.split("/")
+        if "expire" in segs:
+            return int(segs[segs.index("expire") + 1])
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+def _load_stream_cache():
+    global _stream_cache
+    if _stream_cache is None:
+        try:
+            with open(STREAM_CACHE_PATH) as f:
+                _stream_cache = json.load(f)
+        except (OSError, ValueError):
+            _stream_cache = {}
+    return _stream_cache
+
+
+def _save_stream_cache():
+    now = time.time()
+    live = {k: v for k, v in _stream_cache.items() if v.get("expire", 0) > now}
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{STREAM_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(live, f)
+        os.replace(tmp, STREAM_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def cached_track(url):
+    """Cached track record for `url` if its stream URL is not about to expire."""
+    with _stream_lock:
+        entry = _load_stream_cache().get(_cache_key(url))
+    if entry and "thumbnail" in entry and entry["expire"] - time.time() > STREAM_REFRESH_MARGIN:
+        return entry
+    return None
+
+
+def stream_expired(url):
+    """True if the cached stream URL for `url` is past its expiry."""
+    with _stream_lock:
+        entry = _load_stream_cache().get(_cache_key(url))
+    return bool(entry) and entry["expire"] <= time.time()
+
+
+def invalidate_stream(url):
+    """Forget the cached stream URL for `url`, and its downloaded audio if any."""
+    with _stream_lock:
+        if _load_stream_cache().pop(_cache_key(url), None) is not None:
+            _save_stream_cache()
+    local = cached_audio(url)
+    if local:
+        try:
+            os.remove(local)
+        except OSError:
+            pass
+
+
+def _store_track(url, record):
+    record["expire"] = _url_expiry(record["stream_url"]) or int(time.time()) + STREAM_DEFAULT_TTL
+    with _stream_lock:
+        _load_stream_cache()[_cache_key(url)] = record
+        _save_stream_cache()
+
+
+# ─── Track Resolution ─────────────────────────────────────────────────────────
+# One extract_info per track yields everything the player and the art loader
+# need. Concurrent callers for the same track wait on the first one instead
+# of starting a second extraction.
+
+_inflight_lock = threading.Lock()
+_inflight      = {}   # cache key -> Event set when that resolution finishes
+
+
+def resolve_track(url, fresh=False):
     """
     Returns:
-        {type: "video"|"playlist", title: str, tracks: [{title, url}]}
+        {id, title, duration, stream_url, thumbnail, expire} or None
     """
-    url  = normalize_youtube_url(url)
-    opts = {**_BASE_OPTS, "skip_download": True, "extract_flat": True}
+    key = _cache_key(url)
+    while True:
+        if not fresh:
+            hit = cached_track(url)
+            if hit:
+                return hit
+
+        with _inflight_lock:
+            pending = _inflight.get(key)
+            if pending is None:
+                _inflight[key] = threading.Event()
+        if pending is None:
+            break
+        pending.wait()
+        fresh = False   # whoever we waited on has just refreshed the cache
 
     try:
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        record = run_extraction(_extract_track, url)
+        if record and record["stream_url"]:
+            _store_track(url, record)
+        return record
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key).set()
 
-        if "entries" in info and info["entries"]:
-            tracks = [
-                {
-                    "title": e.get("title") or "Unknown",
-                    "url":   e.get("url") or e.get("webpage_url"),
-                }
-                for e in info["entries"] if e
-            ]
-            return {"type": "playlist", "title": info.get("title"), "tracks": tracks}
+
+def resolve_stream(url, fresh=False):
+    local = None if fresh else cached_audio(url)
+    if local:
+        record = cached_track(url) or {}
+        return record.get("title"), record.get("duration"), local
+
+    record = resolve_track(url, fresh)
+    if not record:
+        return None
+    return record["title"], record["duration"], record["stream_url"]
+
+
+def _extract_track(url):
+    url = normalize_youtube_url(url)
+
+    try:
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                with borrow_ydl("track") as ydl:
+                    info = ydl.extract_info(url, download=False)
 
         return {
-            "type":   "video",
-            "title":  info.get("title"),
-            "tracks": [{"title": info.get("title"), "url": url}],
+            "id":         info.get("id") or video_id(url),
+            "title":      info.get("title"),
+            "duration":   info.get("duration"),
+            "stream_url": info.get("url"),
+            "thumbnail":  info.get("thumbnail"),
         }
+    except Exception:
+        return None
+
+
+# ─── Prefetch ─────────────────────────────────────────────────────────────────
+# A single background worker resolves upcoming tracks into the stream cache
+# ahead of time, so a skip only has to hand mpv an already-resolved URL. It
+# also wakes periodically to refresh wanted entries that are close to expiry.
+
+PREFETCH_INTERVAL = 60
+
+_prefetch_lock   = threading.Lock()
+_prefetch_wake   = threading.Event()
+_prefetch_want   = []   # urls to resolve, in priority order
+_prefetch_failed = set()
+_prefetch_thread = None
+
+
+def prefetch(urls):
+    """Replace the wanted set with `urls` and wake the prefetch worker."""
+    global _prefetch_thread
+    with _prefetch_lock:
+        _prefetch_want[:] = [u for u in urls if u]
+        _prefetch_failed.difference_update(_prefetch_want)
+        if _prefetch_thread is None or not _prefetch_thread.is_alive():
+            _prefetch_thread = threading.Thread(target=_prefetch_worker, daemon=True)
+            _prefetch_thread.start()
+    _prefetch_wake.set()
+
+
+def _next_prefetch_url():
+    with _prefetch_lock:
+        wanted = [u for u in _prefetch_want if u not in _prefetch_failed]
+    for url in wanted:
+        if cached_track(url) is None:
+            return url
+    return None
+
+
+def _prefetch_worker():
+    while True:
+        _prefetch_wake.wait(PREFETCH_INTERVAL)
+        _prefetch_wake.clear()
+
+        while (url := _next_prefetch_url()) is not None:
+            if not resolve_track(url, fresh=True):
+                with _prefetch_lock:
+                    _prefetch_failed.add(url)
+
+
+# ─── Streaming Extraction ────────────────────────────────────────────────────
+# Large playlists and mixes are enumerated page by page in a dedicated worker
+# process (see stream_sources), so playback can start on the first entry
+# while the rest arrive.
+
+MEDIA_BATCH = 100   # entries per message after the first one
+
+
+def _flat_track(entry):
+    return {
+        "id":       entry.get("id"),
+        "title":    entry.get("title") or "Unknown",
+        "url":      entry.get("url") or entry.get("webpage_url"),
+        "duration": entry.get("duration"),
+    }
+
+
+def _stream_media_worker(url, feed):
+    """
+    Enumerate `url` into `feed`: ("tracks", [...]) with the first entry
+    alone, then batches, and finally ("done", total) or ("error", message).
+    """
+    _silence_worker()
+    url   = normalize_youtube_url(url)
+    total = 0
+
+    try:
+        with borrow_ydl("flat") as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+            while info.get("_type") in ("url", "url_transparent"):
+                info = ydl.extract_info(info["url"], download=False, process=False)
+
+            if info.get("_type") != "playlist":
+                feed.put(("tracks", [{**_flat_track(info), "url": url}]))
+                feed.put(("done", 1))
+                return
+
+            # Entries are a lazy generator here: each page is only fetched
+            # when iteration reaches it.
+            batch = []
+            for entry in info.get("entries") or ():
+                if not entry:
+                    continue
+                batch.append(_flat_track(entry))
+                if total == 0 or len(batch) >= MEDIA_BATCH:
+                    feed.put(("tracks", batch))
+                    total += len(batch)
+                    batch = []
+            if batch:
+                feed.put(("tracks", batch))
+                total += len(batch)
+
+        feed.put(("done", total) if total else ("error", "playlist is empty"))
 
     except Exception as e:
-        print("extract_media error:", e)
+        feed.put(("error", str(e)))
+
+
+# ─── Multi-Source Queue ───────────────────────────────────────────────────────
+# Several playlists/videos are enumerated concurrently, at most SOURCE_WORKERS
+# processes at a time, and merged into one stream in the order they were
+# given. A source's batches are held until every earlier source has finished,
+# so the queue keeps source order while the total wait is about the slowest
+# source rather than the sum.
+
+SOURCE_WORKERS = 4
+
+
+class _TaggedFeed:
+    """Queue proxy a worker writes to, prefixing each message with its source."""
+
+    def __init__(self, feed, tag):
+        self.feed = feed
+        self.tag  = tag
+
+    def put(self, msg):
+        self.feed.put((self.tag,) + msg)
+
+
+class _WakingQueue(queue.Queue):
+    """queue.Queue that calls notify() after every put, for event-loop readers."""
+
+    def __init__(self, notify):
+        super().__init__()
+        self._notify = notify
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        self._notify()
+
+
+def stream_sources(urls, workers=SOURCE_WORKERS, notify=None):
+    """
+    Start enumerating every URL in `urls` in the background.
+
+    Returns a queue that receives ("tracks", batch) messages, the first one
+    as soon as the first source's first entry is known, then ("done", total)
+    or ("error", message). Duplicates (by video id) are dropped. Progress
+    messages arrive as each source loads:
+        ("source", (index, state, count, detail))
+    where state is "loading", "done" or "error" and detail is the error text.
+    `notify()`, if given, is called from the merge thread after each message.
+    """
+    out = _WakingQueue(notify) if notify else queue.Queue()
+    threading.Thread(
+        target=_merge_sources, args=(list(urls), workers, out), daemon=True
+    ).start()
+    return out
+
+
+def _merge_sources(urls, workers, out):
+    ctx      = multiprocessing.get_context("spawn")
+    feed     = ctx.Queue()
+    held     = [[] for _ in urls]     # batches waiting on an earlier source
+    loaded   = [[] for _ in urls]     # everything a source sent, for its snapshot
+    counts   = [0] * len(urls)
+    finished = [False] * len(urls)
+    procs    = [None] * len(urls)
+    errors   = []
+    seen     = set()
+    total    = started = running = released = 0
+
+    while released < len(urls):
+        while running < workers and started < len(urls):
+            procs[started] = ctx.Process(
+                target=_stream_media_worker,
+                args=(urls[started], _TaggedFeed(feed, started)),
+                daemon=True,
+            )
+            procs[started].start()
+            started += 1
+            running += 1
+
+        try:
+            tag, kind, payload = feed.get(timeout=MEDIA_TIMEOUT)
+        except queue.Empty:
+            # Whatever is left has stalled or never got a slot: give up on it
+            for i in range(released, len(urls)):
+                if not finished[i]:
+                    finished[i] = True
+                    if procs[i] is not None and procs[i].is_alive():
+                        procs[i].terminate()   # don't leave yt_dlp running
+                    errors.append("timed out")
+                    out.put(("source", (i, "error", counts[i], "timed out")))
+            started = len(urls)
+            kind    = None
+
+        if kind == "tracks":
+            held[tag].append(payload)
+            loaded[tag].extend(payload)
+            counts[tag] += len(payload)
+            out.put(("source", (tag, "loading", counts[tag], None)))
+        elif kind is not None:
+            finished[tag] = True
+            running -= 1
+            if kind == "error":
+                errors.append(payload)
+                out.put(("source", (tag, "error", counts[tag], payload)))
+            else:
+                save_snapshot(urls[tag], loaded[tag])
+                out.put(("source", (tag, "done", counts[tag], None)))
+            loaded[tag] = []
+
+        # Release everything that is now at the front, in source order
+        while released < len(urls):
+            for batch in held[released]:
+                fresh = _unseen(batch, seen)
+                if fresh:
+                    out.put(("tracks", fresh))
+                    total += len(fresh)
+            held[released] = []
+            if not finished[released]:
+                break
+            released += 1
+
+    out.put(("done", total) if total else ("error", "; ".join(errors) or "nothing to play"))
+
+
+def _unseen(tracks, seen):
+    """Tracks whose video id is not in `seen` yet, adding theirs to it."""
+    fresh = []
+    for track in tracks:
+        key = video_id(track["url"]) or track["url"]
+        if key not in seen:
+            seen.add(key)
+            fresh.append(track)
+    return fresh
+
+
+# ─── Playlist Snapshots ───────────────────────────────────────────────────────
+# Each fully enumerated source is saved to CACHE_DIR/playlists/<list id>.json,
+# so the next launch with the same URLs can show the queue straight away and
+# let stream_sources() refresh it in the background.
+
+SNAPSHOT_DIR   = os.path.join(CACHE_DIR, "playlists")
+_SNAPSHOT_KEYS = ("id", "title", "url", "duration")
+_LIST_ID       = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def _snapshot_path(url):
+    url = normalize_youtube_url(url)
+    lid = urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get("list")
+    # Only a plain list id is trusted as a file name
+    key = lid[0] if lid and _LIST_ID.fullmatch(lid[0]) else _file_key(url)
+    return os.path.join(SNAPSHOT_DIR, f"{key}.json")
+
+
+def save_snapshot(url, tracks):
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        path = _snapshot_path(url)
+        tmp  = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "url":    url,
+                "saved":  int(time.time()),
+                "tracks": [[t.get(k) for k in _SNAPSHOT_KEYS] for t in tracks],
+            }, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def load_snapshot(url):
+    """Tracks saved for `url` by its last full enumeration, or None."""
+    try:
+        with open(_snapshot_path(url)) as f:
+            rows = json.load(f)["tracks"]
+        return [dict(zip(_SNAPSHOT_KEYS, row)) for row in rows]
+    except (OSError, ValueError, KeyError, TypeError):
         return None
 
 
-# ─── Thumbnail Download ───────────────────────────────────────────────────────
+def load_snapshots(urls):
+    """
+    The merged, deduplicated queue stream_sources(urls) produced last time,
+    or None unless every source has a snapshot.
+    """
+    seen, tracks = set(), []
+    for url in urls:
+        saved = load_snapshot(url)
+        if not saved:
+            return None
+        tracks += _unseen(saved, seen)
+    return tracks
+
+
+# ─── Thumbnail Cache ──────────────────────────────────────────────────────────
+# Thumbnails live in CACHE_DIR/thumbs as <video id>-<variant>.jpg. A hit never
+# touches the network or yt_dlp; mtime doubles as the LRU clock.
+
+THUMB_DIR       = os.path.join(CACHE_DIR, "thumbs")
+THUMB_MAX_BYTES = 64 * 1024 * 1024
+THUMB_VARIANT   = "best"    # "best" = extractor's pick, else an i.ytimg.com name
+
+_thumb_lock = threading.Lock()
+
+
+def _file_key(url):
+    """Filesystem-safe cache key: the video id, or a hash of the URL."""
+    key = video_id(url)
+    if key is None:
+        key = hashlib.sha1(normalize_youtube_url(url).encode()).hexdigest()[:16]
+    return key
 
-def download_thumbnail(url, save_path="cover.jpg"):
-    url  = normalize_youtube_url(url)
-    opts = {**_BASE_OPTS, "skip_download": True, "extract_flat": False}
 
+def _thumb_path(url, variant):
+    return os.path.join(THUMB_DIR, f"{_file_key(url)}-{variant}.jpg")
+
+
+def _evict_lru(directory, suffix, max_bytes):
+    """Delete the least recently touched `suffix` files until under max_bytes."""
     try:
-        with open(os.devnull, "w") as devnull:
-            with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
-                with yt_dlp.YoutubeDL(opts) as ydl:
-                    info          = ydl.extract_info(url, download=False)
-                    thumbnail_url = info.get("thumbnail")
-
-        if thumbnail_url:
-            resp = requests.get(thumbnail_url, stream=True, timeout=10)
-            if resp.status_code == 200:
-                with open(save_path, "wb") as f:
-                    for chunk in resp.iter_content(1024):
-                        f.write(chunk)
-                return True
+        entries = [e for e in os.scandir(directory) if e.name.endswith(suffix)]
+    except OSError:
+        return
+    stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+    total = sum(size for _, size, _ in stats)
+    for _, size, path in sorted(stats):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def download_thumbnail(url, variant=THUMB_VARIANT, max_bytes=THUMB_MAX_BYTES):
+    """Return a local path to the thumbnail for `url`, or None."""
+    path = _thumb_path(url, variant)
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    if variant == "best":
+        record        = resolve_track(url)
+        thumbnail_url = record.get("thumbnail") if record else None
+    else:
+        vid           = video_id(url)
+        thumbnail_url = vid and f"https://i.ytimg.com/vi/{vid}/{variant}.jpg"
+    if not thumbnail_url:
+        return None
+
+    try:
+        resp = requests.get(thumbnail_url, stream=True, timeout=10)
+        if resp.status_code != 200:
+            return None
+
+        os.makedirs(THUMB_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=THUMB_DIR, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in resp.iter_content(16384):
+                    f.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
 
     except Exception:
-        pass
+        return None
+
+    with _thumb_lock:
+        _evict_lru(THUMB_DIR, ".jpg", max_bytes)
+    return path
+
 
-    return False
+DOMINANT_FALLBACK = (214, 214, 214)
+
+
+def _open_drafted(path, size):
+    """Open `path` as RGB, letting the JPEG decoder downscale to about `size`."""
+    im = Image.open(path)
+    im.draft("RGB", (size, size))   # DCT-domain 1/2..1/8 scaling; no-op for non-JPEG
+    return im.convert("RGB")
+
+
+def _dominant_color(im):
+    # getcolors() builds the histogram in C; only the distinct colors of the
+    # 50x50 thumbnail (≤ 2500) are walked in Python.
+    colors = im.resize((50, 50)).getcolors(2500) or []
+    # Skip near-black and near-white
+    return max(((n, c) for n, c in colors if 30 < sum(c) < 700),
+               default=(0, DOMINANT_FALLBACK))[1]
 
 
 def get_dominant_color(path):
     try:
-        im = Image.open(path).convert("RGB")
-        im = im.resize((50, 50)) # Resize small for speed
-        pixels = list(im.getdata())
-        
-        # Simple frequency count, ignoring very dark/very light pixels
-        counts = {}
-        for r, g, b in pixels:
-            if 30 < (r + g + b) < 700: # Skip near-black and near-white
-                rgb = (r, g, b)
-                counts[rgb] = counts.get(rgb, 0) + 1
-        
-        if not counts: return (214, 214, 214) # Fallback to gold-ish
-        return max(counts, key=counts.get)
-    except:
-        return (214, 214, 214)
+        return _dominant_color(_open_drafted(path, 50))
+    except Exception:
+        return DOMINANT_FALLBACK
 
 # ─── Image → Pixel Matrix ────────────────────────────────────────────────────
 
 def get_album_art_matrix(path, size=30):
+    """Decode `path` once and derive both the display matrix and dominant color."""
     try:
         if not os.path.exists(path):
-            return None, 0, 0
+            return None, 0, 0, None
 
-        im = Image.open(path).convert("RGB")
-        # For High-Def Half-Blocks, we want a 1:1 pixel aspect ratio 
+        im = _open_drafted(path, max(size, 50))
+        # For High-Def Half-Blocks, we want a 1:1 pixel aspect ratio
         # before the terminal stretches it.
-        new_width = size
-        new_height = size
-        
-        im = im.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        dom_color = get_dominant_color(path)
-        return list(im.getdata()), new_width, im.height, dom_color
+        art = im.resize((size, size), Image.Resampling.LANCZOS)
+        return _pixels_from_bytes(art.tobytes()), size, size, _dominant_color(im)
+    except Exception:
+        return None, 0, 0, None
+
+
+def _pixels_from_bytes(raw):
+    return list(zip(raw[0::3], raw[1::3], raw[2::3]))
+
+
+# ─── Half-Block Palette ───────────────────────────────────────────────────────
+
+def quantize_half_blocks(pixels, w, h, max_pairs, max_colors=256):
+    """
+    Median-cut `pixels` to the largest palette whose distinct (top, bottom)
+    half-block combinations still fit in `max_pairs` color pairs.
+
+    Returns:
+        (palette, rows) — palette is [(r, g, b)], rows[y][x] is the
+        (top, bottom) palette index pair for character row y.
+    """
+    rows = h // 2
+    raw  = bytes(c for px in pixels[:w * rows * 2] for c in px)
+    im   = Image.frombytes("RGB", (w, rows * 2), raw)
+
+    def attempt(k):
+        q   = im.quantize(colors=k, method=Image.Quantize.MEDIANCUT)
+        idx = q.tobytes()
+        grid = [
+            list(zip(idx[(2*y) * w:(2*y + 1) * w], idx[(2*y + 1) * w:(2*y + 2) * w]))
+            for y in range(rows)
+        ]
+        return q, grid, len({p for row in grid for p in row})
+
+    # More colors never means fewer pairs, so binary search the largest k
+    lo, hi = 1, max(1, min(256, max_colors))
+    best   = attempt(lo)
+    while lo < hi:
+        mid  = (lo + hi + 1) // 2
+        cand = attempt(mid)
+        if cand[2] <= max_pairs:
+            best, lo = cand, mid
+        else:
+            hi = mid - 1
+
+    q, grid, _ = best
+    flat    = q.getpalette()
+    used    = max(q.tobytes(), default=0) + 1
+    palette = [tuple(flat[i*3:i*3 + 3]) for i in range(used)]
+    return palette, grid
+
+
+# ─── Art Matrix Cache ─────────────────────────────────────────────────────────
+# Decoded, resized art plus its dominant color, per (video id, size). Recent
+# entries stay in memory; all of them are also written to CACHE_DIR/art as a
+# small header followed by raw RGB bytes, so revisiting a track never decodes
+# a JPEG again.
+
+ART_DIR         = os.path.join(CACHE_DIR, "art")
+ART_MEM_ENTRIES = 32
+ART_MAX_BYTES   = 8 * 1024 * 1024
+ART_DISK_CACHE  = True
+
+_ART_HEADER = struct.Struct("<4sHHBBB")   # magic, w, h, dominant r, g, b
+_ART_MAGIC  = b"MTA1"
+
+_art_lock  = threading.Lock()
+_art_cache = collections.OrderedDict()    # (key, size) -> (pixels, w, h, dom_rgb)
+
+
+def _read_art_file(path):
+    try:
+        with open(path, "rb") as f:
+            blob = f.read()
+        magic, w, h, r, g, b = _ART_HEADER.unpack_from(blob)
+        raw = blob[_ART_HEADER.size:]
+        if magic != _ART_MAGIC or len(raw) != w * h * 3:
+            return None
+        os.utime(path)
+        return _pixels_from_bytes(raw), w, h, (r, g, b)
+    except (OSError, struct.error):
+        return None
+
+
+def _write_art_file(path, art):
+    pixels, w, h, dom_rgb = art
+    raw = bytes(c for px in pixels for c in px)
+    tmp = None
+    try:
+        os.makedirs(ART_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=ART_DIR, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(_ART_HEADER.pack(_ART_MAGIC, w, h, *dom_rgb))
+            f.write(raw)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        return
+    with _art_lock:
+        _evict_lru(ART_DIR, ".rgb", ART_MAX_BYTES)
+
+
+def load_album_art(url, size=30):
+    """(pixels, w, h, dom_rgb) for `url` at `size`, or None."""
+    key  = (_file_key(url), size)
+    path = os.path.join(ART_DIR, f"{key[0]}-{size}.rgb")
+
+    with _art_lock:
+        art = _art_cache.get(key)
+        if art is not None:
+            _art_cache.move_to_end(key)
+            return art
+
+    art = _read_art_file(path) if ART_DISK_CACHE else None
+    if art is None:
+        thumb = download_thumbnail(url)
+        if not thumb:
+            return None
+        art = get_album_art_matrix(thumb, size)
+        if art[0] is None:
+            return None
+        if ART_DISK_CACHE:
+            _write_art_file(path, art)
+
+    with _art_lock:
+        _art_cache[key] = art
+        while len(_art_cache) > ART_MEM_ENTRIES:
+            _art_cache.popitem(last=False)
+    return art
+
+# ─── Audio Cache ──────────────────────────────────────────────────────────────
+# Opt-in via enable_audio_cache(). The current and upcoming tracks are
+# downloaded in the background to CACHE_DIR/audio/<video id>.audio, and
+# resolve_stream() hands back the local file whenever one exists. As with
+# thumbnails, mtime is the LRU clock.
+
+AUDIO_DIR       = os.path.join(CACHE_DIR, "audio")
+AUDIO_MAX_BYTES = 2 * 1024 ** 3
+AUDIO_WORKERS   = 2
+AUDIO_CHUNK     = 10 * 1024 * 1024   # googlevideo throttles long unranged reads
+
+_audio_lock      = threading.Lock()
+_audio_wake      = threading.Condition(_audio_lock)
+_audio_want      = []      # urls to download, in priority order
+_audio_active    = set()
+_audio_failed    = set()
+_audio_threads   = []
+_audio_max_bytes = None    # None while the cache is disabled
+
+
+def enable_audio_cache(max_bytes=AUDIO_MAX_BYTES):
+    global _audio_max_bytes
+    _audio_max_bytes = max_bytes
+
+
+def _audio_path(url):
+    return os.path.join(AUDIO_DIR, f"{_file_key(url)}.audio")
+
+
+def cached_audio(url):
+    """Path of the downloaded audio for `url`, or None."""
+    if _audio_max_bytes is None:
+        return None
+    path = _audio_path(url)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def ready_stream(url):
+    """Local audio or a fresh cached stream URL for `url`, without resolving."""
+    local = cached_audio(url)
+    if local:
+        return local
+    record = cached_track(url)
+    return record["stream_url"] if record else None
+
+
+def cache_audio(urls):
+    """Replace the set of tracks to download with `urls`; no-op unless enabled."""
+    if _audio_max_bytes is None:
+        return
+    with _audio_lock:
+        _audio_want[:] = [u for u in urls if u]
+        _audio_failed.difference_update(_audio_want)
+        _audio_threads[:] = [t for t in _audio_threads if t.is_alive()]
+        while len(_audio_threads) < AUDIO_WORKERS:
+            t = threading.Thread(target=_audio_worker, daemon=True)
+            t.start()
+            _audio_threads.append(t)
+        _audio_wake.notify_all()
+
+
+def _next_audio_url():
+    for url in _audio_want:
+        if url in _audio_active or url in _audio_failed:
+            continue
+        if not os.path.exists(_audio_path(url)):
+            return url
+    return None
+
+
+def _audio_worker():
+    while True:
+        with _audio_lock:
+            while (url := _next_audio_url()) is None:
+                _audio_wake.wait()
+            _audio_active.add(url)
+
+        ok = False
+        try:
+            ok = _download_audio(url)
+        except Exception:
+            pass
+        finally:
+            with _audio_lock:
+                _audio_active.discard(url)
+                if ok:
+                    _evict_lru(AUDIO_DIR, ".audio", _audio_max_bytes)
+                else:
+                    _audio_failed.add(url)
+
+
+def _download_audio(url):
+    """Fetch the resolved audio stream for `url` into the cache; True on success."""
+    record = resolve_track(url)
+    if not record or not record.get("stream_url"):
+        return False
+
+    tmp = None
+    try:
+        os.makedirs(AUDIO_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=AUDIO_DIR, suffix=".part")
+        with os.fdopen(fd, "wb") as f, requests.Session() as http:
+            pos, size = 0, None
+            while size is None or pos < size:
+                resp = http.get(
+                    record["stream_url"],
+                    headers={
+                        "User-Agent": _BASE_OPTS["user_agent"],
+                        "Range":      f"bytes={pos}-{pos + AUDIO_CHUNK - 1}",
+                    },
+                    stream=True,
+                    timeout=15,
+                )
+                if resp.status_code not in (200, 206):
+                    return False
+                start = pos
+                for chunk in resp.iter_content(65536):
+                    f.write(chunk)
+                    pos += len(chunk)
+                if resp.status_code == 200:
+                    break           # server ignored the range: that was all of it
+                size = int(resp.headers["Content-Range"].rsplit("/", 1)[1])
+                if pos == start:
+                    return False
+        os.replace(tmp, _audio_path(url))
+        return True
     except Exception:
-        return None, 0, 0
\ No newline at end of file
+        return False
+    finally:
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,86 @@
+"""
+Command-line client for the MusicalTerm daemon (`main.py --daemon`).
+
+    python ctl.py status
+    python ctl.py next
+    python ctl.py volume +5
+    python ctl.py queue 1 20
+    python ctl.py add https://www.youtube.com/playlist?list=...
+
+Each call sends one JSON request over the control socket and prints the
+reply; --json prints it raw for scripts. Queue positions are 1-based, as
+in the player's queue view.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+SOCKET_PATH = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or "/tmp",
+    f"musicalterm-{os.getuid()}.sock",
+)
+
+
+def request(cmd, *args, path=SOCKET_PATH, timeout=10):
+    """Send one command to the daemon and return its reply dict."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps({"cmd": cmd, "args": list(args)}).encode() + b"\n")
+        line = sock.makefile("rb").readline()
+    if not line:
+        raise ConnectionError("daemon closed the connection")
+    return json.loads(line)
+
+
+def fmt_t(s):
+    if s is None:
+        return "--:--"
+    s = int(s)
+    return f"{s // 60:02d}:{s % 60:02d}"
+
+
+def show(cmd, result):
+    if cmd == "status":
+        flags = [name for name in ("paused", "shuffle", "repeat", "muted") if result[name]]
+        print(f"{result['index']}/{result['length']}  {result['title']}")
+        print(f"{fmt_t(result['position'])} / {fmt_t(result['duration'])}"
+              f"  vol {result['volume']}%  {' '.join(flags)}".rstrip())
+    elif cmd in ("queue", "search"):
+        for row in result:
+            mark = "▶" if row.get("current") else " "
+            print(f"{mark}{row['index']:5}. {row['title']}")
+    elif result is not None:
+        print(result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Control a running MusicalTerm daemon")
+    parser.add_argument("cmd", help="status, play [N], pause, toggle, next, back, seek S, "
+                                    "volume [N|+N|-N], shuffle, repeat, mute, queue [FROM COUNT], "
+                                    "search TEXT, add URL..., remove N, quit")
+    parser.add_argument("args", nargs="*")
+    parser.add_argument("--json", action="store_true", help="print the raw reply")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    opts = parser.parse_args(argv)
+
+    try:
+        reply = request(opts.cmd, *opts.args, path=opts.socket)
+    except (OSError, ValueError) as e:
+        print(f"musicalterm: no daemon at {opts.socket} ({e})", file=sys.stderr)
+        return 2
+
+    if opts.json:
+        print(json.dumps(reply))
+    elif not reply.get("ok"):
+        print(f"musicalterm: {reply.get('error')}", file=sys.stderr)
+    else:
+        show(opts.cmd, reply.get("result"))
+    return 0 if reply.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Headless mode: the same Controller the curses UI uses, driven over a Unix
+socket (see ctl.py) instead of the keyboard.
+
+Nothing polls on a timer while playing. The loop sleeps until mpv reports
+something that matters (a file starting or ending, idle), a playlist feed or
+track switch has news, or a client sends a command, with a slow housekeeping
+wake for session saves and a dead mpv.
+"""
+
+import inspect
+import json
+import os
+import signal
+import socket
+import threading
+
+import core
+import player
+import session
+from controller import Controller, State, is_wake_event
+from ctl import SOCKET_PATH
+
+IDLE_WAKE = 5.0   # seconds between housekeeping ticks when nothing happens
+
+
+# ─── Commands ─────────────────────────────────────────────────────────────────
+# Each takes the controller plus the client's string arguments and returns
+# something JSON-serialisable. Queue positions are 1-based on the wire.
+
+def _index(ctl, n):
+    idx = int(n) - 1
+    if not 0 <= idx < len(ctl.st.queue):
+        raise ValueError(f"no track {n}")
+    return idx
+
+
+def _row(st, idx):
+    return {"index": idx + 1, "title": st.queue.titles[idx], "url": st.queue.urls[idx],
+            "current": idx == st.current_idx}
+
+
+def _status(ctl):
+    st = ctl.st
+    return {
+        "index":    st.current_idx + 1,
+        "length":   len(st.queue),
+        "title":    st.queue.titles[st.current_idx] if st.queue else None,
+        "url":      st.queue.urls[st.current_idx] if st.queue else None,
+        "position": player.get_position(),
+        "duration": player.get_duration(),
+        "paused":   st.paused,
+        "volume":   st.volume,
+        "muted":    st.muted,
+        "shuffle":  st.shuffle,
+        "repeat":   st.repeat,
+        "loading":  st.loading,
+    }
+
+
+def _play(ctl, n=None):
+    if n is None:
+        ctl.resume()
+    else:
+        ctl.start_track(_index(ctl, n))
+
+
+def _toggle(ctl):
+    ctl.resume() if ctl.st.paused else ctl.pause()
+
+
+def _volume(ctl, value=None):
+    if value is not None:
+        base = ctl.st.volume if value[:1] in ("+", "-") else 0
+        ctl.set_volume(base + int(value))
+    return ctl.st.volume
+
+
+def _switch(attr, toggle):
+    """A command that flips `attr`, or sets it with an explicit on/off."""
+    def command(ctl, value=None):
+        if value is None or (value == "on") != getattr(ctl.st, attr):
+            getattr(ctl, toggle)()
+        return getattr(ctl.st, attr)
+    return command
+
+
+def _queue(ctl, start=None, count="50"):
+    st    = ctl.st
+    first = _index(ctl, start) if start else max(0, st.current_idx - 2)
+    return [_row(st, i) for i in range(first, min(len(st.queue), first + int(count)))]
+
+
+def _search(ctl, *words):
+    st        = ctl.st
+    st.search = " ".join(words)
+    st.run_search()
+    hits, st.search = st.hits[:50], None
+    return [_row(st, i) for i in hits]
+
+
+def _add(ctl, *urls):
+    if not urls:
+        raise ValueError("add needs at least one URL")
+    ctl.add_sources(list(urls))
+
+
+def _remove(ctl, n):
+    if not ctl.remove(_index(ctl, n)):
+        raise ValueError("can't remove the playing track")
+
+
+COMMANDS = {
+    "status":  _status,
+    "play":    _play,
+    "pause":   lambda ctl: ctl.pause(),
+    "resume":  lambda ctl: ctl.resume(),
+    "toggle":  _toggle,
+    "next":    lambda ctl: ctl.next(),
+    "back":    lambda ctl: ctl.back(),
+    "seek":    lambda ctl, seconds: ctl.seek(float(seconds)),
+    "volume":  _volume,
+    "shuffle": _switch("shuffle", "toggle_shuffle"),
+    "repeat":  _switch("repeat", "toggle_repeat"),
+    "mute":    _switch("muted", "toggle_mute"),
+    "queue":   _queue,
+    "search":  _search,
+    "add":     _add,
+    "remove":  _remove,
+}
+
+
+# ─── Server ───────────────────────────────────────────────────────────────────
+
+def _listen(path):
+    """Bind the control socket, clearing a stale one left by a dead daemon."""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise SystemExit(f"musicalterm: a daemon is already listening on {path}")
+        finally:
+            probe.close()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old    = os.umask(0o177)   # owner-only: the socket can play anything
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old)
+    server.listen()
+    return server
+
+
+def _serve_client(conn, ctl, lock, wake, stop):
+    with conn:
+        out = conn.makefile("wb")
+        for line in conn.makefile("rb"):
+            try:
+                msg  = json.loads(line)
+                if not isinstance(msg, dict):
+                    raise ValueError("bad request")
+                cmd  = msg.get("cmd")
+                args = [str(a) for a in msg.get("args", [])]
+                if cmd == "quit":
+                    stop.set()
+                    reply = {"ok": True, "result": None}
+                elif cmd not in COMMANDS:
+                    reply = {"ok": False, "error": f"unknown command {cmd!r}"}
+                else:
+                    fn = COMMANDS[cmd]
+                    try:
+                        inspect.signature(fn).bind(ctl, *args)
+                    except TypeError:
+                        raise ValueError(f"wrong arguments for {cmd!r}")
+                    with lock:
+                        reply = {"ok": True, "result": fn(ctl, *args)}
+            except ValueError as e:
+                reply = {"ok": False, "error": str(e) or "bad request"}
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            wake.set()
+            try:
+                out.write(json.dumps(reply).encode() + b"\n")
+                out.flush()
+            except OSError:
+                return
+
+
+def _accept(server, ctl, lock, wake, stop):
+    while not stop.is_set():
+        try:
+            conn, _ = server.accept()
+        except OSError:
+            return
+        threading.Thread(target=_serve_client, args=(conn, ctl, lock, wake, stop),
+                         daemon=True).start()
+
+
+def serve(sources=(), resume=False, path=SOCKET_PATH):
+    """Run the player headless until a client sends `quit` or SIGTERM/SIGINT arrives."""
+    # Claim the socket before any work, so a second daemon bails out at once
+    server = _listen(path)
+    st     = State()
+    wake   = threading.Event()
+    ctl    = Controller(st, notify=wake.set)
+    lock   = threading.RLock()
+    stop   = threading.Event()
+    start  = None
+
+    def on_event(msg):
+        if is_wake_event(msg):
+            wake.set()
+
+    def on_signal(signum, frame):
+        stop.set()
+        wake.set()
+
+    try:
+        core.start_workers()
+        player.start_idle()
+        player.add_event_listener(on_event)
+
+        resumed = session.load() if resume else None
+        if resumed:
+            ctl.restore(resumed)
+            start = resumed.get("position")
+        elif resume and not sources:
+            raise SystemExit("musicalterm: no saved session to resume")
+        else:
+            error = ctl.open_sources(list(sources)) if sources else "give URLs or --resume"
+            if error:
+                raise SystemExit(f"musicalterm: nothing to play: {error}")
+
+        signal.signal(signal.SIGTERM, on_signal)
+        signal.signal(signal.SIGINT, on_signal)
+        threading.Thread(target=_accept, args=(server, ctl, lock, wake, stop), daemon=True).start()
+
+        with lock:
+            ctl.start_track(st.current_idx, push=False, start=start)
+        while not stop.is_set():
+            wake.wait(IDLE_WAKE)
+            wake.clear()
+            with lock:
+                ctl.tick()
+    finally:
+        server.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        player.remove_event_listener(on_event)
+        with lock:
+            ctl.close()
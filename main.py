@@ -1,5 +1,33 @@
+import argparse
 import curses
+import core
+import daemon
 from ui import run_ui
 
 if __name__ == "__main__":
-    curses.wrapper(run_ui)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="MusicalTerm — terminal music player")
+    parser.add_argument(
+        "--cache-audio", metavar="MB", type=int, nargs="?",
+        const=core.AUDIO_MAX_BYTES // 2**20,
+        help="keep downloaded audio of the current and upcoming tracks for "
+             f"offline replay (default cap {core.AUDIO_MAX_BYTES // 2**20} MB)",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="pick up the last session: same queue, track, position and settings",
+    )
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="run headless, controlled through ctl.py over a Unix socket",
+    )
+    parser.add_argument("urls", nargs="*", help="what to play in --daemon mode")
+    args = parser.parse_args()
+    if args.urls and not args.daemon:
+        parser.error("URLs on the command line need --daemon")
+    if args.cache_audio:
+        core.enable_audio_cache(args.cache_audio * 2**20)
+
+    if args.daemon:
+        daemon.serve(args.urls, resume=args.resume)
+    else:
+        curses.wrapper(run_ui, resume=args.resume)
@@ -1,116 +1,279 @@
 import subprocess
+import threading
+import itertools
 import socket
 import json
-import os
-import time
+import concurrent.futures
 import core
 
-MPV_SOCKET = f"/tmp/mpvsocket_{os.getpid()}"
+MPV_ARGS = [
+    "mpv",
+    "--no-video",
+    "--no-terminal",
+    "--really-quiet",
+    "--msg-level=all=no",
+    "--idle=yes",
+]
+
+# Properties mirrored locally from mpv's property-change events
+OBSERVED = ("time-pos", "duration", "pause", "volume", "mute", "idle-active", "eof-reached",
+            "playlist-pos")
 
 _mpv_process = None
 _ipc_socket  = None
-_muted       = False
+_muted       = False  # last mute state we set, until mpv reports its own
+_volume      = 70     # applied to freshly spawned instances
+_send_lock   = threading.Lock()
+_pending     = {}     # request_id -> Future awaiting mpv's reply
+_pending_lock = threading.Lock()
+_request_ids = itertools.count(1)
+_listeners   = []     # callables fed every async event from mpv
+_state_lock  = threading.Lock()
+_props       = {}     # property name -> last value pushed by mpv
+_end_reason  = None   # reason from mpv's last end-file event
+_start_reset = False  # clear the "start" option once the file it was for loads
+
+# Gapless: the next track is appended to mpv's playlist ahead of time
+_queued_entry = None  # mpv playlist_entry_id of the appended track
+_queued_tag   = None  # caller's url for that entry
+_queue_gen    = 0     # bumped per append/replace; stale append replies are ignored
+_advanced     = None  # tag of a queued entry mpv has moved on to by itself
 
 
 # ─── IPC ──────────────────────────────────────────────────────────────────────
 
-def _connect_ipc(retries=50, delay=0.1):
+def _attach(sock):
+    """Adopt a connected socket to mpv: start its reader and observe state."""
     global _ipc_socket
-    for _ in range(retries):
-        if os.path.exists(MPV_SOCKET):
-            try:
-                s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                s.settimeout(2.0)
-                s.connect(MPV_SOCKET)
-                _ipc_socket = s
-                return True
-            except OSError:
-                pass
-        time.sleep(delay)
-    return False
+    with _state_lock:
+        _props.clear()
+    _ipc_socket = sock
+    threading.Thread(target=_reader, args=(sock,), daemon=True).start()
+    _observe()
+
+
+def _observe():
+    # Pipelined: all observe requests go out before any reply comes back
+    for i, prop in enumerate(OBSERVED, 1):
+        command_async("observe_property", i, prop)
+
+
+def add_event_listener(fn):
+    """Call `fn(event_dict)` from the reader thread for every mpv event."""
+    _listeners.append(fn)
+
+
+def remove_event_listener(fn):
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def _handle_event(msg):
+    global _end_reason, _start_reset, _queued_entry, _queued_tag, _advanced
+    event = msg.get("event")
+    with _state_lock:
+        if event == "property-change":
+            _props[msg.get("name")] = msg.get("data")
+        elif event == "end-file":
+            # With a queued entry mpv carries straight on, so eof isn't an end
+            if not (msg.get("reason") == "eof" and _queued_entry is not None):
+                _end_reason = msg.get("reason")
+            _props["time-pos"] = None
+        elif event == "start-file":
+            _props["time-pos"] = None
+            _props["duration"] = None
+            if _queued_entry is not None and msg.get("playlist_entry_id") == _queued_entry:
+                _advanced, _queued_entry, _queued_tag = _queued_tag, None, None
+        elif event == "file-loaded" and _start_reset:
+            _start_reset = False
+            command_async("set_property", "start", "none")
+    for fn in list(_listeners):
+        try:
+            fn(msg)
+        except Exception:
+            pass
 
 
-def _send_command(command):
-    global _ipc_socket
+def _resolve(request_id, reply):
+    with _pending_lock:
+        future = _pending.pop(request_id, None)
+    if future is not None and not future.done():
+        future.set_result(reply)
 
-    if _ipc_socket is None:
-        return None
 
+def _reader(sock):
+    """Demultiplex mpv's output: events update state, replies go by request_id."""
+    global _ipc_socket
     try:
-        payload = json.dumps(command).encode() + b"\n"
-        _ipc_socket.send(payload)
-
-        response = b""
-        while True:
-            chunk = _ipc_socket.recv(4096)
-            if not chunk:
-                return None
-            response += chunk
-            if response.endswith(b"\n"):
-                break
-
-        data = json.loads(response.decode().strip())
-        if "data" in data or data.get("error") == "success":
-            return data
-
-    except (OSError, json.JSONDecodeError, BrokenPipeError):
+        for line in sock.makefile("rb"):
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if "event" in msg:
+                _handle_event(msg)
+            elif "request_id" in msg:
+                _resolve(msg["request_id"], msg)
+    except (OSError, ValueError):
+        pass
+
+    if _ipc_socket is sock:
         _ipc_socket = None   # socket died; mark for reconnect
+    with _pending_lock:
+        orphans = list(_pending)
+    for request_id in orphans:
+        _resolve(request_id, None)
+
+
+def command_async(*args):
+    """
+    Send an mpv command without waiting for it. Returns a Future resolving
+    to mpv's reply dict, or None if the socket is gone.
+    """
+    future = concurrent.futures.Future()
+    sock   = _ipc_socket
+    if sock is None:
+        future.set_result(None)
+        return future
+
+    request_id = next(_request_ids)
+    with _pending_lock:
+        _pending[request_id] = future
+    try:
+        payload = json.dumps({"command": list(args), "request_id": request_id}).encode()
+        with _send_lock:
+            sock.sendall(payload + b"\n")
+    except OSError:
+        _resolve(request_id, None)
+    return future
+
+
+def _send_command(command, timeout=2.0):
+    future = command_async(*command["command"])
+    try:
+        data = future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        return None
 
+    if data and ("data" in data or data.get("error") == "success"):
+        return data
     return None
 
 
 def _ensure_connected():
-    """Attempt to reconnect IPC if socket dropped."""
-    global _ipc_socket
-    if _ipc_socket is None and _mpv_process and _mpv_process.poll() is None:
-        _connect_ipc(retries=5, delay=0.05)
+    """The socketpair can't be re-dialled: an mpv that lost it gets replaced."""
+    if _ipc_socket is None and is_running():
+        stop_stream()
+
+
+# ─── Process ──────────────────────────────────────────────────────────────────
+# mpv is started idle, ahead of the first track, and talks over one end of a
+# socketpair passed down as --input-ipc-client=fd://N (mpv ≥ 0.35). The
+# connection exists before mpv does, so there is no socket file to poll for:
+# commands queue in the socket and the first reply is the readiness signal.
+
+def start_idle():
+    """Spawn a warm, idle mpv if none is running. Returns False if mpv is missing."""
+    global _mpv_process
+    if is_running():
+        return True
+
+    ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        _mpv_process = subprocess.Popen(
+            MPV_ARGS + [f"--volume={_volume}", f"--mute={'yes' if is_muted() else 'no'}",
+                        f"--input-ipc-client=fd://{theirs.fileno()}"],
+            pass_fds=(theirs.fileno(),),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+        )
+    except OSError:
+        ours.close()
+        return False
+    finally:
+        theirs.close()
+
+    _attach(ours)
+    return True
 
 
 # ─── Playback ─────────────────────────────────────────────────────────────────
 
-def play_stream(url):
-    global _mpv_process, _ipc_socket
+def play_stream(url, resolved=None, start=None):
+    """Play `url`, optionally from `start` seconds in."""
+    global _end_reason, _start_reset, _queued_entry, _queued_tag, _queue_gen
 
-    resolved = core.resolve_stream(url)
+    resolved = resolved or core.resolve_stream(url)
     if not resolved:
         raise RuntimeError("Stream resolution failed")
 
     title, duration, stream_url = resolved
     stream_url = stream_url or url
+    start_opt  = f"{start:.1f}" if start else "none"
 
-    # Hot-swap track if mpv is already alive
-    if _mpv_process and _mpv_process.poll() is None:
+    with _state_lock:
+        _end_reason  = None   # whatever ended before this belongs to the old track
+        _start_reset = bool(start)
+        _queued_entry, _queued_tag = None, None   # replace clears mpv's playlist
+        _queue_gen  += 1
+
+    # Load into the warm instance; a dead or wedged mpv gets one respawn
+    for _ in range(2):
         _ensure_connected()
-        if _ipc_socket:
-            res = _send_command({"command": ["loadfile", stream_url, "replace"]})
-            if res is not None:
-                return
+        if not start_idle():
+            raise RuntimeError("mpv could not be started")
+        command_async("set_property", "start", start_opt)
+        if _send_command({"command": ["loadfile", stream_url, "replace"]}) is not None:
+            return
         stop_stream()
+    raise RuntimeError("mpv did not accept the stream")
 
-    # Fresh mpv process
-    if os.path.exists(MPV_SOCKET):
-        os.remove(MPV_SOCKET)
-
-    cmd = [
-        "mpv",
-        "--no-video",
-        "--no-terminal",
-        "--really-quiet",
-        f"--input-ipc-server={MPV_SOCKET}",
-        "--msg-level=all=no",
-        "--volume=70",
-        stream_url,
-    ]
-
-    _mpv_process = subprocess.Popen(
-        cmd,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-        stdin=subprocess.DEVNULL,
-    )
 
-    if not _connect_ipc():
-        raise RuntimeError("mpv IPC socket not created in time")
+# ─── Track Switching ──────────────────────────────────────────────────────────
+# Switches resolve and load off the caller's thread with latest-wins
+# semantics: rapid requests collapse into the newest, and a resolution that
+# finishes after it was superseded is dropped instead of loaded.
+
+_switch_error = None
+
+
+def _switch(gen, url, start):
+    global _switch_error
+    resolved = core.resolve_stream(url)
+    if not _switcher.is_current(gen):
+        return
+    try:
+        if not resolved:
+            raise RuntimeError("Stream resolution failed")
+        play_stream(url, resolved, start)
+    except RuntimeError as e:
+        if _switcher.is_current(gen):
+            _switch_error = str(e)
+
+
+_switcher = core.LatestOnly(_switch)
+
+
+def request_play(url, start=None):
+    """Queue a switch to `url` without blocking; returns its generation."""
+    return _switcher.submit(url, start)
+
+
+def set_switch_listener(fn):
+    """Call `fn()` from the switch thread whenever a requested switch finishes or fails."""
+    _switcher.on_done = fn
+
+
+def switch_pending():
+    return _switcher.busy()
+
+
+def take_switch_error():
+    global _switch_error
+    err, _switch_error = _switch_error, None
+    return err
 
 
 def stop_stream():
@@ -144,45 +307,112 @@ def is_running():
     return _mpv_process is not None and _mpv_process.poll() is None
 
 
+# ─── Gapless ──────────────────────────────────────────────────────────────────
+
+def queue_next(url, stream_url):
+    """
+    Replace whatever follows the current file in mpv's playlist with
+    `stream_url`, so mpv buffers it ahead and switches without a gap.
+    `url` is the tag handed back by take_advanced() once it starts.
+    Doesn't wait for mpv: the entry counts as queued once its reply lands.
+    """
+    global _queue_gen
+    if not is_running():
+        return False
+    _ensure_connected()
+    with _state_lock:
+        _queue_gen += 1
+        gen = _queue_gen
+    command_async("playlist-clear")
+    command_async("loadfile", stream_url, "append").add_done_callback(
+        lambda future: _queued(gen, url, future.result())
+    )
+    return True
+
+
+def _queued(gen, url, reply):
+    global _queued_entry, _queued_tag
+    data = reply.get("data") if reply else None
+    with _state_lock:
+        if gen != _queue_gen:
+            return
+        _queued_entry = data.get("playlist_entry_id") if isinstance(data, dict) else None
+        _queued_tag   = url if _queued_entry is not None else None
+
+
+def play_next():
+    """Jump to the queued entry; False if nothing is queued."""
+    with _state_lock:
+        queued = _queued_entry is not None
+    return queued and _send_command({"command": ["playlist-next", "weak"]}) is not None
+
+
+def take_advanced():
+    """Return (then clear) the tag of a queued track mpv has started on its own."""
+    global _advanced
+    with _state_lock:
+        tag, _advanced = _advanced, None
+    return tag
+
+
+def take_end_reason():
+    """
+    Return (then clear) the reason from mpv's last end-file event: "eof"
+    when a track finished, "error" when a stream failed (e.g. a 403 on an
+    expired URL), "stop"/"quit" otherwise. None if nothing ended.
+    """
+    global _end_reason
+    with _state_lock:
+        reason, _end_reason = _end_reason, None
+    return reason
+
+
 # ─── Controls ─────────────────────────────────────────────────────────────────
 
+# Fire-and-forget: the result shows up through the observed properties.
+
 def pause_stream():
     _ensure_connected()
-    _send_command({"command": ["set_property", "pause", True]})
+    command_async("set_property", "pause", True)
 
 
 def resume_stream():
     _ensure_connected()
-    _send_command({"command": ["set_property", "pause", False]})
+    command_async("set_property", "pause", False)
 
 
 def seek(seconds):
     _ensure_connected()
-    _send_command({"command": ["seek", seconds, "relative"]})
+    command_async("seek", seconds, "relative")
 
 
 def set_volume(value):
+    global _volume
     _ensure_connected()
-    value = max(0, min(150, int(value)))
-    _send_command({"command": ["set_property", "volume", value]})
+    _volume = max(0, min(150, int(value)))
+    command_async("set_property", "volume", _volume)
 
 
 def toggle_mute():
     global _muted
     _ensure_connected()
-    _muted = not _muted
-    _send_command({"command": ["set_property", "mute", _muted]})
+    _muted = not is_muted()
+    command_async("set_property", "mute", _muted)
+    return _muted
 
 
 # ─── Info ─────────────────────────────────────────────────────────────────────
 
 def _get(prop):
-    _ensure_connected()
-    res = _send_command({"command": ["get_property", prop]})
-    return res["data"] if res and "data" in res else None
+    with _state_lock:
+        return _props.get(prop)
 
 
 def get_position():  return _get("time-pos")
 def get_duration():  return _get("duration")
-def get_volume():    return _get("volume")
-def is_muted():      return _muted
\ No newline at end of file
+
+
+def is_muted():
+    """mpv's observed mute state; what we last set until it reports one."""
+    mute = _get("mute")
+    return _muted if mute is None else bool(mute)
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+Queue data structures sized for very large playlists.
+"""
+
+import random
+from array import array
+from collections import namedtuple
+
+Track = namedtuple("Track", "title url")
+
+
+# ─── Track List ───────────────────────────────────────────────────────────────
+
+class TrackList:
+    """Column storage for the queue: one list per field rather than a dict per track."""
+
+    __slots__ = ("titles", "urls")
+
+    def __init__(self, tracks=()):
+        self.titles = []
+        self.urls   = []
+        self.extend(tracks)
+
+    def extend(self, tracks):
+        """Append track dicts ({title, url}) as produced by core."""
+        for t in tracks:
+            self.titles.append(t.get("title") or "Unknown")
+            self.urls.append(t.get("url"))
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __getitem__(self, idx):
+        return Track(self.titles[idx], self.urls[idx])
+
+    def __delitem__(self, idx):
+        del self.titles[idx]
+        del self.urls[idx]
+
+    def __iter__(self):
+        return map(Track, self.titles, self.urls)
+
+
+# ─── Shuffle Pool ─────────────────────────────────────────────────────────────
+
+class ShufflePool:
+    """
+    Unplayed queue indices in random order. `_order` holds the remaining
+    indices (the next one is at the end) and `_pos` maps each queue index to
+    its slot in `_order`, or -1, so pop, remove, add and membership are all
+    O(1).
+    """
+
+    def __init__(self):
+        self._order = array("l")
+        self._pos   = array("l")
+
+    def reset(self, size, exclude=None):
+        order = [i for i in range(size) if i != exclude]
+        random.shuffle(order)
+        self.restore(order, size)
+
+    def clear(self):
+        self._order = array("l")
+        self._pos   = array("l")
+
+    def remap(self, mapping, size):
+        """Renumber after the queue changed: old index -> new, unmapped ones dropped."""
+        self.restore([mapping[i] for i in self._order if i in mapping], size)
+
+    def dump(self):
+        """The remaining indices in storage order, for restore()."""
+        return self._order.tolist()
+
+    def restore(self, order, size):
+        """Load `order` as produced by dump(), for a queue of `size` tracks."""
+        self._order = array("l", order)
+        self._pos   = array("l", [-1]) * size
+        for slot, idx in enumerate(order):
+            self._pos[idx] = slot
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, idx):
+        return 0 <= idx < len(self._pos) and self._pos[idx] >= 0
+
+    def peek(self):
+        return self._order[-1]
+
+    def head(self, n):
+        """The next `n` indices pop() will return, in order."""
+        return list(self._order[:-n - 1:-1])
+
+    def pop(self):
+        idx = self._order.pop()
+        self._pos[idx] = -1
+        return idx
+
+    def discard(self, idx):
+        if idx not in self:
+            return
+        slot, last = self._pos[idx], self._order[-1]
+        self._order[slot] = last
+        self._pos[last]   = slot
+        self._order.pop()
+        self._pos[idx] = -1
+
+    def add(self, idx):
+        """Insert `idx` at a uniformly random point in the remaining order."""
+        if idx >= len(self._pos):
+            self._pos.extend([-1] * (idx + 1 - len(self._pos)))
+        if idx in self:
+            return
+        self._order.append(idx)
+        slot  = random.randrange(len(self._order))
+        other = self._order[slot]
+        self._order[slot], self._order[-1] = idx, other
+        self._pos[other] = len(self._order) - 1
+        self._pos[idx]   = slot
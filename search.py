@@ -0,0 +1,135 @@
+"""
+Incremental title index for searching large queues.
+"""
+
+import heapq
+import re
+from array import array
+from collections import Counter
+
+_NON_WORD = re.compile(r"[\W_]+")
+_EMPTY    = array("l")
+
+RANK_MAX   = 5000  # beyond this many matches, keep queue order instead of ranking
+FUZZY_MIN  = 10    # top up with typo-tolerant matches below this many hits
+FUZZY_FRAC = 0.5   # share of query grams a fuzzy match must contain
+
+
+def normalize(text):
+    """Casefolded words joined by single spaces, padded with one space each side."""
+    words = _NON_WORD.sub(" ", text.casefold()).split()
+    return f" {' '.join(words)} " if words else ""
+
+
+def _title_grams(norm):
+    """Token-start bigrams plus padded trigrams, e.g. ' a', ' ab', 'abc', 'bc '."""
+    grams = set()
+    for word in norm.split():
+        padded = f" {word} "
+        grams.add(padded[:2])
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _query_grams(words):
+    """Grams every title matching `words` as word prefixes must contain."""
+    grams = set()
+    for word in words:
+        padded = f" {word}"    # the last word may still be typed: no end pad
+        if len(padded) == 2:
+            grams.add(padded)
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+# ─── Title Index ──────────────────────────────────────────────────────────────
+
+class TitleIndex:
+    """
+    Gram -> ascending array of title ids. Titles are only ever appended, so
+    extend() indexes just the new ones and postings stay sorted.
+
+    A query matches a title when each query word is a prefix of some word in
+    the title. Candidates come from the rarest posting (or the previous
+    results when the query only grew) and are checked against the normalized
+    title, so typing one more character never rescans the whole index.
+    """
+
+    def __init__(self):
+        self._grams = {}
+        self._norm  = []
+        self._last  = None   # (words, matches) of the previous exact query
+
+    def __len__(self):
+        return len(self._norm)
+
+    def extend(self, titles):
+        grams = self._grams
+        for title in titles:
+            tid  = len(self._norm)
+            norm = normalize(title or "")
+            self._norm.append(norm)
+            for g in _title_grams(norm):
+                posting = grams.get(g)
+                if posting is None:
+                    grams[g] = posting = array("l")
+                posting.append(tid)
+        self._last = None
+
+    def _exact(self, words):
+        grams  = _query_grams(words)
+        cands  = min((self._grams.get(g, _EMPTY) for g in grams), key=len)
+        verify = len(grams) > 1   # a lone word-start gram is its own answer
+        last   = self._last
+        if last and len(last[1]) < len(cands) and _refines(words, last[0]):
+            cands, verify = last[1], True
+        if not verify:
+            return list(cands)
+        norm    = self._norm
+        needles = [f" {w}" for w in words]
+        return [i for i in cands if all(n in norm[i] for n in needles)]
+
+    def _fuzzy(self, words, exclude, limit):
+        """Titles sharing most query grams, for typos and mid-word matches."""
+        grams   = [g for g in _query_grams(words) if g in self._grams]
+        # Very common grams cost the most to count and say the least
+        common  = max(64, len(self._norm) // 8)
+        useful  = [g for g in grams if len(self._grams[g]) <= common] or grams
+        need    = max(1, round(len(useful) * FUZZY_FRAC))
+        votes   = Counter()
+        for g in useful:
+            votes.update(self._grams[g])
+        hits = [(n, i) for i, n in votes.items() if n >= need and i not in exclude]
+        return [i for n, i in heapq.nlargest(limit, hits, key=lambda h: (h[0], -h[1]))]
+
+    def search(self, query, limit=200):
+        """Title ids best matching `query`, best first."""
+        words = normalize(query).split()
+        if not words:
+            return []
+        matches    = self._exact(words)
+        self._last = (words, matches)
+
+        if len(matches) <= RANK_MAX:
+            phrase = f" {' '.join(words)}"
+            norm   = self._norm
+
+            def rank(i):
+                pos = norm[i].find(phrase)
+                return (pos < 0, pos, len(norm[i]), i)
+
+            hits = heapq.nsmallest(limit, matches, key=rank)
+        else:
+            hits = matches[:limit]
+
+        if len(hits) < FUZZY_MIN and len(hits) < limit:
+            hits += self._fuzzy(words, set(hits), limit - len(hits))
+        return hits
+
+
+def _refines(words, prev):
+    """True when every title matching `words` also matches `prev`."""
+    if len(words) < len(prev):
+        return False
+    return all(w == p for w, p in zip(words, prev[:-1])) \
+        and words[len(prev) - 1].startswith(prev[-1])
@@ -0,0 +1,95 @@
+"""
+Session persistence for `--resume`: the queue, where playback was, and the
+player settings.
+"""
+
+import gzip
+import json
+import os
+import time
+
+import core
+
+SESSION_PATH       = os.path.join(core.CACHE_DIR, "session.json")
+SESSION_QUEUE_PATH = os.path.join(core.CACHE_DIR, "session-queue.json.gz")
+SAVE_INTERVAL      = 15     # seconds between saves while running
+HISTORY_KEEP       = 1000   # most recent back-stack entries saved
+
+_saved_queue = None   # State.queue_version last written
+
+
+def _gzip_text(path, mode):
+    return gzip.open(path, mode, compresslevel=1)
+
+
+def _write(path, data, opener=open):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with opener(tmp, "wt") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def save(st, position):
+    """
+    Persist `st` (a controller.State) and the playback position. The queue is
+    rewritten only when it changed since the last save, so periodic saves
+    of a long queue stay cheap.
+    """
+    global _saved_queue
+    if not st.queue:
+        return
+    try:
+        os.makedirs(core.CACHE_DIR, exist_ok=True)
+        if st.queue_version != _saved_queue:
+            _write(SESSION_QUEUE_PATH,
+                   {"titles": st.queue.titles, "urls": st.queue.urls}, _gzip_text)
+            _saved_queue = st.queue_version
+        _write(SESSION_PATH, {
+            "saved":    int(time.time()),
+            "length":   len(st.queue),
+            "sources":  st.source_urls,
+            "current":  st.current_idx,
+            "position": position,
+            "history":  st.history[-HISTORY_KEEP:],
+            "shuffle":  st.shuffle,
+            "pool":     st.shuffle_pool.dump() if st.shuffle else [],
+            "repeat":   st.repeat,
+            "volume":   st.volume,
+            "muted":    st.muted,
+        })
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def load():
+    """The last saved session as a dict with the queue under "tracks", or None."""
+    try:
+        with open(SESSION_PATH) as f:
+            data = json.load(f)
+        with _gzip_text(SESSION_QUEUE_PATH, "rt") as f:
+            columns = json.load(f)
+        if len(columns["urls"]) != data.get("length") or not columns["urls"]:
+            return None   # the two files are from different saves
+        data["tracks"] = [{"title": t, "url": u}
+                          for t, u in zip(columns["titles"], columns["urls"])]
+    except (OSError, EOFError, KeyError, TypeError, ValueError, AttributeError):
+        return None
+    return data
+
+
+def restore(st, data):
+    """Load a session from load() into a fresh `st`."""
+    st.extend_queue(data["tracks"])
+    size = len(st.queue)
+
+    st.source_urls = data.get("sources") or []
+    st.sources     = [["done", 0] for _ in st.source_urls]
+    st.current_idx = min(max(0, data.get("current", 0)), size - 1)
+    st.history     = [i for i in data.get("history", []) if 0 <= i < size]
+    st.repeat      = bool(data.get("repeat"))
+    st.volume      = data.get("volume", st.volume)
+    st.muted       = bool(data.get("muted"))
+    st.shuffle     = bool(data.get("shuffle"))
+    if st.shuffle:
+        pool = [i for i in data.get("pool", []) if isinstance(i, int) and 0 <= i < size]
+        st.shuffle_pool.restore(list(dict.fromkeys(pool)), size)
@@ -3,13 +3,17 @@ MusicalTerm — Terminal Music Player
 Aesthetic: Dark obsidian / warm amber & rose accents
 """
 
+import os
+import sys
+import asyncio
 import curses
 import threading
-import random
 import time
 from pyfiglet import Figlet
 import core
 import player
+from controller import State, Controller, is_wake_event
+import session
 
 # ─── Fonts ────────────────────────────────────────────────────────────────────
 try:
@@ -63,106 +67,169 @@ C_MAGENTA = 10  # Tertiary accent — soft lavender
 
 # ─── Art State ────────────────────────────────────────────────────────────────
 art_lock = threading.Lock()
-art_data = {"pixels": None, "w": 0, "h": 0, "loading": False, "dom_idx": 51}
-
-
-# ─── State ────────────────────────────────────────────────────────────────────
-class State:
-    def __init__(self):
-        self.queue          = []
-        self.shuffle_pool   = []  # remaining unplayed indices for true shuffle
-        self.history        = []
-        self.current_idx    = 0
-        self.volume         = 70
-        self.paused         = False
-        self.repeat         = False
-        self.shuffle        = False
-        self.muted          = False
-        self.view           = "player"
-        self.queue_offset   = 0
-        self._status_msg    = ""
-        self._status_ts     = 0
-        self.spin_idx       = 0
-
-    def set_status(self, msg, ttl=3.0):
-        self._status_msg = msg
-        self._status_ts  = time.time() + ttl
-
-    def get_status(self):
-        return self._status_msg if time.time() < self._status_ts else ""
-
-    def reset_shuffle_pool(self):
-        """Rebuild the shuffle pool excluding the current track."""
-        self.shuffle_pool = [i for i in range(len(self.queue)) if i != self.current_idx]
-        random.shuffle(self.shuffle_pool)
-
-    def next_idx(self):
-        if not self.queue:
-            return 0
-        if self.shuffle:
-            # True no-repeat shuffle: drain pool, refill when empty
-            if not self.shuffle_pool:
-                self.reset_shuffle_pool()
-            if self.shuffle_pool:
-                return self.shuffle_pool.pop(0)
-            return self.current_idx
-        return (self.current_idx + 1) % len(self.queue)
+art_data = {"pixels": None, "w": 0, "h": 0, "loading": False, "dom_idx": 51, "gen": 0}
 
 
 # ─── Art Loading ──────────────────────────────────────────────────────────────
 
-def _bg_load_art(url, art_width):
+def _bg_load_art(job, url, art_width):
+    """Runs on the art worker; results for superseded tracks are dropped."""
     global art_data
+    art = core.load_album_art(url, size=art_width - 4)
+
     with art_lock:
-        art_data["loading"] = True
+        if not _art_worker.is_current(job):
+            return
+        if art:
+            px, w, h, dom_rgb = art
+            art_data.update(pixels=px, w=w, h=h, dom_idx=to256(*dom_rgb),
+                            gen=art_data["gen"] + 1)
+        art_data["loading"] = False
 
-    if core.download_thumbnail(url, "cover.jpg"):
-        px, w, h, dom_rgb = core.get_album_art_matrix("cover.jpg", size=art_width - 4)
-        dom_idx = 16 + int(dom_rgb[0]/255*5)*36 + int(dom_rgb[1]/255*5)*6 + int(dom_rgb[2]/255*5)
 
-        with art_lock:
-            art_data.update(pixels=px, w=w, h=h, dom_idx=dom_idx)
-            curses.init_pair(C_ART_BG, dom_idx, -1)
-            curses.init_pair(C_QUEUE_H, dom_idx, -1)
+_art_worker = core.LatestOnly(_bg_load_art)
 
+
+def trigger_art_load(url, art_width):
     with art_lock:
-        art_data["loading"] = False
+        art_data["loading"] = True
+    _art_worker.submit(url, art_width)
 
 
-def trigger_art_load(url, art_width):
-    threading.Thread(target=_bg_load_art, args=(url, art_width), daemon=True).start()
+# ─── Art Rendering ────────────────────────────────────────────────────────────
+# Each image is rendered once into a pad; frames just copy the pad into the
+# panel. Art pairs are re-allocated from ART_PAIR_BASE for each new image, so
+# ids never creep past what color_pair() can address. When an image needs
+# more pairs than the terminal has, it is median-cut down to a palette that
+# fits rather than letting cells fall back to pair 0.
 
+ART_PAIR_BASE  = 16    # pair ids below this are reserved for the theme
+ART_COLOR_BASE = 256   # first redefinable color slot in "custom" mode
 
-def draw_art(win, pixels, img_w, img_h):
-    """Renders album art using the Half-Block technique for HD color."""
-    if not pixels:
-        return
+_CUBE     = (0, 95, 135, 175, 215, 255)
+_CUBE_IDX = [min(range(6), key=lambda i: abs(_CUBE[i] - v)) for v in range(256)]
 
-    def to256(r, g, b):
-        return 16 + int(r/255*5)*36 + int(g/255*5)*6 + int(b/255*5)
-
-    cache, nxt = {}, 15
-    for y in range(0, img_h - 1, 2):
-        for x in range(img_w):
-            idx_top = y * img_w + x
-            idx_bot = (y + 1) * img_w + x
-            if idx_top >= len(pixels) or idx_bot >= len(pixels):
-                continue
-            r1, g1, b1 = pixels[idx_top]
-            r2, g2, b2 = pixels[idx_bot]
-            fg, bg = to256(r1, g1, b1), to256(r2, g2, b2)
-            key = (fg, bg)
-            if key not in cache:
-                if nxt < curses.COLOR_PAIRS:
-                    curses.init_pair(nxt, fg, bg)
-                    cache[key] = nxt
-                    nxt += 1
-                else:
-                    cache[key] = 0
+_art_pairs = {}        # (fg, bg) -> pair id for the current image
+_art_view  = {"gen": -1, "pad": None, "rows": 0, "cols": 0}
+
+
+def to256(r, g, b):
+    """Nearest xterm-256 color: best of the 6x6x6 cube and the gray ramp."""
+    ci = (_CUBE_IDX[r], _CUBE_IDX[g], _CUBE_IDX[b])
+    cr, cg, cb = (_CUBE[i] for i in ci)
+    gi = max(0, min(23, round(((r + g + b) / 3 - 8) / 10)))
+    gv = 8 + gi * 10
+    if (r-gv)**2 + (g-gv)**2 + (b-gv)**2 < (r-cr)**2 + (g-cg)**2 + (b-cb)**2:
+        return 232 + gi
+    return 16 + ci[0]*36 + ci[1]*6 + ci[2]
+
+
+def _supports_truecolor():
+    cterm = os.environ.get("COLORTERM", "").lower()
+    term  = os.environ.get("TERM", "").lower()
+    return "truecolor" in cterm or "24bit" in cterm or "truecolor" in term
+
+
+def _art_color_mode():
+    """
+    "direct" — terminfo takes 24-bit RGB as color numbers
+    "custom" — truecolor terminal with redefinable slots past the xterm 256
+    "256"    — map to the fixed xterm palette
+    """
+    if not _supports_truecolor():
+        return "256"
+    if curses.COLORS >= 1 << 24:
+        return "direct"
+    if curses.can_change_color() and curses.COLORS > ART_COLOR_BASE + 16:
+        return "custom"
+    return "256"
+
+
+def _palette_colors(palette, mode):
+    """Terminal color numbers for `palette`, defining custom slots if needed."""
+    if mode == "direct":
+        return [(r << 16) | (g << 8) | b for r, g, b in palette]
+    if mode == "custom":
+        colors = []
+        for i, (r, g, b) in enumerate(palette):
+            slot = ART_COLOR_BASE + i
+            curses.init_color(slot, r * 1000 // 255, g * 1000 // 255, b * 1000 // 255)
+            colors.append(slot)
+        return colors
+    return [to256(*rgb) for rgb in palette]
+
+
+def _pair_limit():
+    """
+    Pair ids usable for drawing. curses.color_pair() keeps only 8 bits of
+    the pair number, so ids past 255 wrap onto the theme pairs even when
+    the terminal reports 65536.
+    """
+    return min(curses.COLOR_PAIRS, 256)
+
+
+def _alloc_art_pairs(keys):
+    """Give every (fg, bg) in `keys` a pair id, starting over from ART_PAIR_BASE."""
+    limit = _pair_limit()
+    _art_pairs.clear()           # the previous image's pad is being replaced
+    nxt = ART_PAIR_BASE
+    for key in keys:
+        if nxt >= limit:
+            break
+        curses.init_pair(nxt, *key)
+        _art_pairs[key] = nxt
+        nxt += 1
+
+
+def _art_cells(pixels, img_w, img_h):
+    """Rows of (fg, bg) terminal colors, one per half-block cell."""
+    rows   = min(img_h // 2, len(pixels) // (2 * img_w)) if img_w else 0
+    mode   = _art_color_mode()
+    budget = _pair_limit() - ART_PAIR_BASE
+
+    if mode != "custom":
+        # Map pixels straight through; only quantize if that overflows
+        conv  = _palette_colors(pixels, mode) if mode == "direct" else None
+        color = (lambda i: conv[i]) if conv else (lambda i: to256(*pixels[i]))
+        cells = [
+            [(color((2*y) * img_w + x), color((2*y + 1) * img_w + x)) for x in range(img_w)]
+            for y in range(rows)
+        ]
+        if len({k for row in cells for k in row}) <= budget:
+            return cells
+
+    max_colors = curses.COLORS - ART_COLOR_BASE if mode == "custom" else 256
+    palette, grid = core.quantize_half_blocks(pixels, img_w, rows * 2, budget, max_colors)
+    colors = _palette_colors(palette, mode)
+    return [[(colors[t], colors[b]) for t, b in row] for row in grid]
+
+
+def build_art(gen, pixels, img_w, img_h):
+    """Render half-block art for image `gen` into the cached pad."""
+    cells = _art_cells(pixels, img_w, img_h)
+    rows  = len(cells)
+
+    _alloc_art_pairs(dict.fromkeys(key for row in cells for key in row))
+
+    pad = curses.newpad(rows + 1, img_w + 1)
+    for y, row in enumerate(cells):
+        for x, key in enumerate(row):
             try:
-                win.addch((y // 2) + 1, x + 1, "▀", curses.color_pair(cache[key]))
+                pad.addstr(y, x, "▀", curses.color_pair(_art_pairs.get(key, 0)))
             except curses.error:
                 pass
+    _art_view.update(gen=gen, pad=pad, rows=rows, cols=img_w)
+
+
+def draw_art(win):
+    """Blit the cached art pad into the panel, inside its border."""
+    pad, rows, cols = _art_view["pad"], _art_view["rows"], _art_view["cols"]
+    if pad is None or rows == 0:
+        return
+    try:
+        pad.overwrite(win, 0, 0, 1, 1, rows, cols)
+    except curses.error:
+        pass
 
 
 # ─── Primitives ───────────────────────────────────────────────────────────────
@@ -241,6 +308,7 @@ def get_url_input(stdscr):
         "  • YT Music song  → https://music.youtube.com/watch?v=...",
         "  • YT Music list  → https://music.youtube.com/playlist?list=...",
         "",
+        "Several URLs (space separated) or a file of URLs also work.",
         "Press ENTER to confirm  ·  ESC or Ctrl+C to quit",
     ]
     for line in hint_lines:
@@ -309,12 +377,44 @@ def get_url_input(stdscr):
                     return url
 
 
+def parse_sources(text):
+    """
+    Split the entered text into URLs. A token naming an existing file is
+    replaced by the URLs in it, one per line; blank lines and lines starting
+    with # are skipped.
+    """
+    urls = []
+    for token in text.replace(",", " ").split():
+        path = os.path.expanduser(token)
+        if os.path.isfile(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line and not line.startswith("#"):
+                            urls.append(line)
+            except OSError:
+                pass
+        else:
+            urls.append(token)
+    return list(dict.fromkeys(urls))
+
+
 # ─── Panels ───────────────────────────────────────────────────────────────────
 
 def render_art_panel(win, st, art_w, art_h):
     win.erase()
     with art_lock:
-        dom_idx = art_data.get("dom_idx", 214)
+        loading = art_data["loading"]
+        pixels  = art_data["pixels"]
+        iw, ih  = art_data["w"], art_data["h"]
+        gen     = art_data["gen"]
+        dom_idx = art_data["dom_idx"]
+
+    if pixels and gen != _art_view["gen"]:
+        curses.init_pair(C_ART_BG, dom_idx, -1)
+        curses.init_pair(C_QUEUE_H, dom_idx, -1)
+        build_art(gen, pixels, iw, ih)
 
     border_color = curses.color_pair(C_ART_BG)
     dim          = curses.color_pair(C_DIM)
@@ -322,16 +422,11 @@ def render_art_panel(win, st, art_w, art_h):
     draw_box(win, art_h, art_w, border_color)
     panel_label(win, "A L B U M", art_w, border_color)
 
-    with art_lock:
-        loading = art_data["loading"]
-        pixels  = art_data["pixels"]
-        iw, ih  = art_data["w"], art_data["h"]
-
     if loading:
         sp = CHARS["spin"][st.spin_idx % 4]
         S(win, art_h//2, (art_w-12)//2, f" {sp}  loading… ", dim)
     elif pixels:
-        draw_art(win, pixels, iw, ih)
+        draw_art(win)
     else:
         center_y = art_h // 2
         center_x = art_w // 2
@@ -343,10 +438,9 @@ def render_art_panel(win, st, art_w, art_h):
                 if dx*dx + dy*dy < radius*radius:
                     S(win, y, x, "•", dim)
         S(win, center_y, center_x-3, "VINYL", border_color | curses.A_BOLD)
-    win.refresh()
 
 
-def render_player_panel(win, st, p_w, p_h):
+def render_player_panel(win, st, p_w, p_h, elapsed, duration):
     win.erase()
     accent = curses.color_pair(C_ACCENT)
     dim    = curses.color_pair(C_DIM)
@@ -361,7 +455,7 @@ def render_player_panel(win, st, p_w, p_h):
     panel_label(win, "N O W  P L A Y I N G", p_w, accent)
 
     track   = st.queue[st.current_idx] if st.queue else None
-    title   = track["title"] if track else "No track loaded"
+    title   = track.title if track else "No track loaded"
     counter = f"{st.current_idx+1:02}/{len(st.queue):02}"
     display_title = f"❖ {trunc(title, iw - len(counter) - 6)}"
     S(win, 2, 2, display_title, accent | curses.A_BOLD)
@@ -419,13 +513,11 @@ def render_player_panel(win, st, p_w, p_h):
     draw_hrule(win, p_h - 5, 0, p_w, accent)
 
     # Progress bar
-    elapsed  = player.get_position()
-    duration = player.get_duration()
     if elapsed is not None and duration and duration > 0:
         prog   = min(1.0, elapsed / duration)
         bw     = iw - 2
         filled = round(prog * bw)
-        pulse  = st.spin_idx % 6
+        pulse  = st.pulse_idx % 6
         bar_chars = []
         for i in range(bw):
             if i < filled:
@@ -446,7 +538,6 @@ def render_player_panel(win, st, p_w, p_h):
     if status:
         S(win, p_h-2, 2, trunc(status, iw), stat | curses.A_DIM)
 
-    win.refresh()
 
 
 def render_queue_panel(win, st, p_w, p_h):
@@ -463,6 +554,10 @@ def render_queue_panel(win, st, p_w, p_h):
     else:
         panel_label(win, f"Q U E U E  ({len(st.queue)})", p_w, accent)
 
+    if st.search is not None:
+        render_search_rows(win, st, p_w, p_h)
+        return
+
     visible = p_h - 4
     if st.current_idx < st.queue_offset:
         st.queue_offset = st.current_idx
@@ -473,7 +568,7 @@ def render_queue_panel(win, st, p_w, p_h):
         idx = st.queue_offset + i
         if idx >= len(st.queue):
             break
-        label  = trunc(st.queue[idx].get("title") or "Unknown", p_w - 8)
+        label  = trunc(st.queue.titles[idx], p_w - 8)
         is_cur = idx == st.current_idx
 
         if is_cur:
@@ -490,7 +585,39 @@ def render_queue_panel(win, st, p_w, p_h):
         note = f" {st.queue_offset+1}–{end}/{total} "
         S(win, p_h-2, p_w-len(note)-1, note, dim | curses.A_DIM)
 
-    win.refresh()
+    if st.loading:
+        sp   = CHARS["spin"][st.spin_idx % 4]
+        note = f"{sp} refreshing…" if st.refreshing else f"{sp} loading {total}…"
+        if len(st.sources) > 1:
+            done  = sum(state != "loading" for state, _ in st.sources)
+            note += f" {done}/{len(st.sources)} sources"
+        S(win, p_h-2, 2, note, cyan | curses.A_DIM)
+
+
+
+def render_search_rows(win, st, p_w, p_h):
+    accent = curses.color_pair(C_ACCENT)
+    dim    = curses.color_pair(C_DIM)
+    white  = curses.color_pair(C_WHITE)
+    hl     = curses.color_pair(C_QUEUE_H)
+
+    S(win, 2, 2, "/", accent | curses.A_BOLD)
+    S(win, 2, 4, trunc(st.search, p_w - 16) + "▏", white)
+    if st.search:
+        note = f" {len(st.hits)} found " if st.hits else " no match "
+        S(win, 2, p_w-len(note)-1, note, dim | curses.A_DIM)
+    draw_hrule(win, 3, 0, p_w, accent)
+
+    visible = p_h - 6
+    first   = max(0, st.hit_sel - visible + 1)
+    for row, idx in enumerate(st.hits[first:first + visible]):
+        label = trunc(st.queue.titles[idx], p_w - 10)
+        if first + row == st.hit_sel:
+            S(win, row+4, 1, f" {idx+1:4}. {label}", hl | curses.A_BOLD | curses.A_REVERSE)
+        elif idx == st.current_idx:
+            S(win, row+4, 1, f" {idx+1:4}. {label}", hl)
+        else:
+            S(win, row+4, 1, f" {idx+1:4}. {label}", dim)
 
 
 def render_footer(win, width, st):
@@ -507,8 +634,10 @@ def render_footer(win, width, st):
         keys = [("Q","quit"),("P","pause"),("R","resume"),("N","next"),
                 ("B","back"),("S","shuffle"),("L","loop"),("M","mute"),
                 ("↑↓","vol"),("←→","seek"),("TAB","queue")]
+    elif st.search is not None:
+        keys = [("↑↓","select"),("↵","play"),("ESC","cancel")]
     else:
-        keys = [("TAB","player"),("↑↓","scroll"),("↵","play"),("Q","quit")]
+        keys = [("TAB","player"),("↑↓","scroll"),("↵","play"),("/","search"),("Q","quit")]
 
     cx = max(0, (width - sum(len(k)+len(v)+4 for k,v in keys) - len(keys)) // 2)
     for i, (k, v) in enumerate(keys):
@@ -520,7 +649,6 @@ def render_footer(win, width, st):
             S(win, 1, cx, CHARS["v_line"], accent)
             cx += 1
 
-    win.refresh()
 
 
 def render_header(win, banner, width, st):
@@ -529,11 +657,118 @@ def render_header(win, banner, width, st):
     for i, line in enumerate(banner):
         cp = curses.color_pair(colors[i % len(colors)])
         S(win, i, max(0, (width - len(line))//2), line, cp | curses.A_BOLD)
-    win.refresh()
+
+# ─── Compositor ───────────────────────────────────────────────────────────────
+# Panels are redrawn only when their signature changes, staged with
+# noutrefresh, and pushed to the terminal with a single doupdate per frame.
+
+class Compositor:
+    def __init__(self):
+        self._sigs = {}
+
+    def draw(self, win, sig, render, *args):
+        if self._sigs.get(win) == sig:
+            return
+        self._sigs[win] = sig
+        render(win, *args)
+        win.noutrefresh()
+
+    def flush(self):
+        curses.doupdate()
+
+
+def art_signature(st):
+    with art_lock:
+        loading = art_data["loading"]
+        return (
+            art_data["gen"],
+            art_data["pixels"] is not None,
+            loading,
+            st.spin_idx % 4 if loading else None,
+        )
+
+
+def player_signature(st, elapsed, duration):
+    if elapsed is not None and duration:
+        # Position at display resolution, plus the bar's pulse while playing
+        progress = (int(elapsed), int(duration), None if st.paused else st.pulse_idx % 6)
+    else:
+        progress = ("buffering", st.spin_idx % 4)
+    return (
+        "player", st.current_idx, len(st.queue), st.paused, st.shuffle, st.repeat,
+        st.muted, len(st.shuffle_pool), st.volume, st.get_status(), progress,
+    )
+
+
+def queue_signature(st):
+    if st.search is not None:
+        return ("search", st.search, st.hit_sel, tuple(st.hits), st.current_idx)
+    return (
+        "queue", st.queue_version, st.queue_offset, st.current_idx, len(st.queue), st.shuffle,
+        len(st.shuffle_pool), st.loading, st.spin_idx % 4 if st.loading else None,
+        tuple(state for state, _ in st.sources),
+    )
+
+
+# ─── Frame Pacing ─────────────────────────────────────────────────────────────
+# The main loop redraws when something happens (a key, an mpv event, a
+# background task finishing) and otherwise on a timer that runs only as fast
+# as what is on screen moves.
+
+FRAME_BUSY    = 0.1    # a spinner is showing
+FRAME_PLAYING = 0.25   # progress bar and clock of a playing track
+FRAME_IDLE    = 1.0    # paused, or nothing on screen moves
+
+
+def frame_interval(st, elapsed, duration):
+    with art_lock:
+        spinning = art_data["loading"]
+    if st.view == "player":
+        spinning = spinning or elapsed is None or not duration
+    elif st.search is None:
+        spinning = spinning or st.loading
+    if spinning:
+        return FRAME_BUSY
+    if st.view == "player" and not st.paused:
+        return FRAME_PLAYING
+    return FRAME_IDLE
+
+
+# ─── Search Input ─────────────────────────────────────────────────────────────
+
+def read_search_keys(stdscr, st):
+    """
+    Drain pending keystrokes into the `/` prompt, re-running the search once
+    per batch. Returns the queue index picked with Enter, or None.
+    """
+    query = st.search
+    while st.search is not None:
+        try:
+            ch = stdscr.get_wch()
+        except curses.error:
+            break
+        if ch in ("\n", curses.KEY_ENTER):
+            picked    = st.hits[st.hit_sel] if st.hits else None
+            st.search = None
+            return picked
+        elif ch == "\x1b":
+            st.search = None
+        elif ch in ("\x08", "\x7f", curses.KEY_BACKSPACE):
+            st.search = st.search[:-1]
+        elif ch == curses.KEY_UP:
+            st.hit_sel = max(0, st.hit_sel - 1)
+        elif ch == curses.KEY_DOWN:
+            st.hit_sel = min(len(st.hits) - 1, st.hit_sel + 1) if st.hits else 0
+        elif isinstance(ch, str) and ch.isprintable():
+            st.search += ch
+    if st.search is not None and st.search != query:
+        st.run_search()
+    return None
+
 
 # ─── Main ─────────────────────────────────────────────────────────────────────
 
-def run_ui(stdscr):
+def run_ui(stdscr, resume=False):
     curses.curs_set(0)
     curses.start_color()
     curses.use_default_colors()
@@ -561,149 +796,189 @@ def run_ui(stdscr):
         curses.napms(3000)
         return
 
-    # ── URL Input ───────────────────────────────────────────────────────────
-    url = get_url_input(stdscr)
-    if not url:
-        return
-
-    stdscr.clear()
-    stdscr.refresh()
-
-    banner   = f_title.renderText("MusicalTerm").splitlines()
-    banner_h = len(banner) + 1
-    art_w, art_h = 40, 20
-    p_w  = min(width - art_w - 6, 58)
-    p_h  = art_h
-    sx   = max(0, (width - art_w - p_w - 2) // 2)
-    cy   = banner_h + 1
+    # Spawn the extraction workers and a warm mpv while the user is still typing
+    core.start_workers()
+    player.start_idle()
+    ctl = None
+    try:
+        # ── URL Input (or the saved session) ────────────────────────────────
+        resumed = session.load() if resume else None
+        if resumed is None:
+            url = get_url_input(stdscr)
+            if not url:
+                return
+
+        stdscr.clear()
+        stdscr.refresh()
 
-    header_win = curses.newwin(banner_h, width,   0,        0)
-    art_win    = curses.newwin(art_h,    art_w,   cy,       sx)
-    main_win   = curses.newwin(p_h,      p_w,     cy,       sx + art_w + 2)
-    footer_win = curses.newwin(3,        width,   height-3, 0)
+        banner   = f_title.renderText("MusicalTerm").splitlines()
+        banner_h = len(banner) + 1
+        art_w, art_h = 40, 20
+        p_w  = min(width - art_w - 6, 58)
+        p_h  = art_h
+        sx   = max(0, (width - art_w - p_w - 2) // 2)
+        cy   = banner_h + 1
+
+        header_win = curses.newwin(banner_h, width,   0,        0)
+        art_win    = curses.newwin(art_h,    art_w,   cy,       sx)
+        main_win   = curses.newwin(p_h,      p_w,     cy,       sx + art_w + 2)
+        footer_win = curses.newwin(3,        width,   height-3, 0)
+
+        st    = State()
+        frame = Compositor()
+        frame.draw(header_win, ("header",), render_header, banner, width, st)
+
+        # Threads (mpv's reader, the switch and art workers, playlist feeds) wake
+        # the loop through `notify`; it may fire before the loop runs or after it
+        # has closed.
+        loop = asyncio.new_event_loop()
+        wake = asyncio.Event()
+
+        def notify():
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass
 
-    st = State()
-    render_header(header_win, banner, width, st)
+        def on_event(msg):
+            if is_wake_event(msg):
+                notify()
 
-    S(stdscr, cy + art_h//2, sx + 2, "  ◐  fetching playlist…  ",
-      curses.color_pair(C_DIM) | curses.A_DIM)
-    stdscr.refresh()
+        def on_enter(track):
+            trigger_art_load(track.url, art_w)
+            st.set_status(f"{CHARS['play']}  {trunc(track.title, 40)}")
 
-    media = core.extract_media(url)
-    if not media or not media.get("tracks"):
-        S(stdscr, cy + art_h//2, sx + 2, "  ✕  failed to load media. Check URL and try again.  ",
-          curses.color_pair(C_STATUS) | curses.A_BOLD)
-        stdscr.refresh()
-        curses.napms(3000)
-        return
+        _art_worker.on_done = notify
+        player.add_event_listener(on_event)
+        ctl = Controller(st, on_enter, notify)
+        if resumed:
+            ctl.restore(resumed)
+        else:
+            S(stdscr, cy + art_h//2, sx + 2, "  ◐  fetching playlist…  ",
+              curses.color_pair(C_DIM) | curses.A_DIM)
+            stdscr.refresh()
 
-    st.queue = media["tracks"]
-    st.reset_shuffle_pool()
-
-    def start_track(idx, push=True):
-        if push and st.current_idx != idx:
-            st.history.append(st.current_idx)
-        st.current_idx = idx
-        if idx in st.shuffle_pool:
-            st.shuffle_pool.remove(idx)
-        track = st.queue[idx]
-        player.play_stream(track["url"])
-        player.set_volume(st.volume)
-        st.paused = False
-        trigger_art_load(track["url"], art_w)
-        st.set_status(f"{CHARS['play']}  {trunc(track['title'] or '…', 40)}")
-
-    start_track(0, push=False)
-    _end_armed = False
+            if ctl.open_sources(parse_sources(url)):
+                S(stdscr, cy + art_h//2, sx + 2, "  ✕  failed to load media. Check URL and try again.  ",
+                  curses.color_pair(C_STATUS) | curses.A_BOLD)
+                stdscr.refresh()
+                curses.napms(3000)
+                loop.close()
+                return
 
-    while True:
-        key = stdscr.getch()
+        ctl.start_track(st.current_idx, push=False, start=resumed and resumed.get("position"))
 
-        if key == ord("q"):
-            player.stop_stream()
-            break
+        def on_key(key):
+            if key == ord("\t"):
+                st.view = "queue" if st.view == "player" else "player"
 
-        elif key == ord("\t"):
-            st.view = "queue" if st.view == "player" else "player"
+            elif key == ord("/"):
+                st.view   = "queue"
+                st.search = ""
+                st.run_search()
 
-        elif st.view == "queue":
-            if   key == curses.KEY_UP:   st.queue_offset = max(0, st.queue_offset-1)
-            elif key == curses.KEY_DOWN: st.queue_offset = min(len(st.queue)-1, st.queue_offset+1)
-            elif key in [ord("\n"), curses.KEY_ENTER]:
-                start_track(st.queue_offset)
-                st.view = "player"
+            elif st.view == "queue":
+                if   key == curses.KEY_UP:   st.queue_offset = max(0, st.queue_offset-1)
+                elif key == curses.KEY_DOWN: st.queue_offset = min(len(st.queue)-1, st.queue_offset+1)
+                elif key in [ord("\n"), curses.KEY_ENTER]:
+                    ctl.start_track(st.queue_offset)
+                    st.view = "player"
 
-        else:
-            if key == ord("n"):
-                start_track(st.next_idx())
-            elif key == ord("b"):
-                if st.history:
-                    start_track(st.history.pop(), push=False)
-                elif st.current_idx > 0:
-                    start_track(st.current_idx - 1)
-            elif key == ord("p"):
-                player.pause_stream()
-                st.paused = True
-                st.set_status(f"{CHARS['pause']}  paused")
-            elif key == ord("r"):
-                player.resume_stream()
-                st.paused = False
-                st.set_status(f"{CHARS['play']}  resumed")
-            elif key == ord("s"):
-                st.shuffle = not st.shuffle
-                if st.shuffle:
-                    st.reset_shuffle_pool()
-                    st.set_status(f"{CHARS['shuffle_on']}  shuffle on  ·  {len(st.shuffle_pool)} tracks in pool")
+            else:
+                if key == ord("n"):
+                    ctl.next()
+                elif key == ord("b"):
+                    ctl.back()
+                elif key == ord("p"):
+                    ctl.pause()
+                    st.set_status(f"{CHARS['pause']}  paused")
+                elif key == ord("r"):
+                    ctl.resume()
+                    st.set_status(f"{CHARS['play']}  resumed")
+                elif key == ord("s"):
+                    if ctl.toggle_shuffle():
+                        st.set_status(f"{CHARS['shuffle_on']}  shuffle on  ·  {len(st.shuffle_pool)} tracks in pool")
+                    else:
+                        st.set_status(f"{CHARS['shuffle_off']}  shuffle off")
+                elif key == ord("l"):
+                    ctl.toggle_repeat()
+                    st.set_status(f"{CHARS['repeat_on']}  repeat {'on' if st.repeat else 'off'}")
+                elif key == ord("m"):
+                    ctl.toggle_mute()
+                    st.set_status(f"{CHARS['mute']}  {'muted' if st.muted else 'unmuted'}")
+                elif key == curses.KEY_UP:
+                    ctl.set_volume(st.volume + 5)
+                    st.set_status(f"{CHARS['vol']}  {st.volume}%", 1.5)
+                elif key == curses.KEY_DOWN:
+                    ctl.set_volume(st.volume - 5)
+                    st.set_status(f"{CHARS['vol']}  {st.volume}%", 1.5)
+                elif key == curses.KEY_RIGHT:
+                    ctl.seek(10)
+                    st.set_status("⏩  +10 s", 1.0)
+                elif key == curses.KEY_LEFT:
+                    ctl.seek(-10)
+                    st.set_status("⏪  −10 s", 1.0)
+
+        def read_keys():
+            """Handle every pending keystroke. False once the user quits."""
+            while True:
+                if st.search is not None:
+                    picked = read_search_keys(stdscr, st)
+                    if picked is not None:
+                        ctl.start_track(picked)
+                        st.view = "player"
+                    if st.search is not None:
+                        return True
+                    continue
+                key = stdscr.getch()
+                if key == -1:
+                    return True
+                if key == ord("q"):
+                    return False
+                on_key(key)
+
+        async def main_loop():
+            while read_keys():
+                pos, dur = ctl.tick()
+
+                # Animations follow the clock, so they keep pace at any frame rate
+                now          = time.monotonic()
+                st.spin_idx  = int(now / FRAME_BUSY)
+                st.pulse_idx = int(now / FRAME_PLAYING)
+
+                frame.draw(header_win, ("header",), render_header, banner, width, st)
+                frame.draw(art_win, art_signature(st), render_art_panel, st, art_w, art_h)
+                if st.view == "player":
+                    frame.draw(main_win, player_signature(st, pos, dur),
+                               render_player_panel, st, p_w, p_h, pos, dur)
                 else:
-                    st.shuffle_pool = []
-                    st.set_status(f"{CHARS['shuffle_off']}  shuffle off")
-            elif key == ord("l"):
-                st.repeat = not st.repeat
-                st.set_status(f"{CHARS['repeat_on']}  repeat {'on' if st.repeat else 'off'}")
-            elif key == ord("m"):
-                st.muted = not st.muted
-                player.toggle_mute()
-                st.set_status(f"{CHARS['mute']}  {'muted' if st.muted else 'unmuted'}")
-            elif key == curses.KEY_UP:
-                st.volume = min(100, st.volume+5)
-                player.set_volume(st.volume)
-                st.set_status(f"{CHARS['vol']}  {st.volume}%", 1.5)
-            elif key == curses.KEY_DOWN:
-                st.volume = max(0, st.volume-5)
-                player.set_volume(st.volume)
-                st.set_status(f"{CHARS['vol']}  {st.volume}%", 1.5)
-            elif key == curses.KEY_RIGHT:
-                player.seek(10)
-                st.set_status("⏩  +10 s", 1.0)
-            elif key == curses.KEY_LEFT:
-                player.seek(-10)
-                st.set_status("⏪  −10 s", 1.0)
-
-        # Auto-advance
-        if not st.paused and player.is_running():
-            pos = player.get_position()
-            dur = player.get_duration()
-            near = pos is not None and dur and dur > 0 and (dur - pos) < 0.8
-            if near and not _end_armed:
-                _end_armed = True
-                start_track(
-                    st.current_idx if st.repeat else st.next_idx(),
-                    push=not st.repeat
-                )
-            elif not near:
-                _end_armed = False
-        elif not player.is_running() and not st.paused and st.queue:
-            start_track(st.next_idx())
-
-        # Render
-        render_header(header_win, banner, width, st)
-        render_art_panel(art_win, st, art_w, art_h)
-        (render_player_panel if st.view == "player" else render_queue_panel)(
-            main_win, st, p_w, p_h)
-        render_footer(footer_win, width, st)
-
-        st.spin_idx += 1
-        curses.napms(100)
+                    frame.draw(main_win, queue_signature(st), render_queue_panel, st, p_w, p_h)
+                frame.draw(footer_win, (st.view, st.search is not None), render_footer, width, st)
+                frame.flush()
+
+                # Sleep until input or an event, or the next frame boundary
+                interval = frame_interval(st, pos, dur)
+                try:
+                    await asyncio.wait_for(wake.wait(), interval - now % interval)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+
+        loop.add_reader(sys.stdin.fileno(), wake.set)
+        try:
+            loop.run_until_complete(main_loop())
+        finally:
+            player.remove_event_listener(on_event)
+            _art_worker.on_done = None
+            loop.remove_reader(sys.stdin.fileno())
+            loop.close()
+    finally:
+        # Every exit path, including errors, saves and stops mpv and the workers
+        if ctl is not None:
+            ctl.close()
+        else:
+            player.stop_stream()
+            core.shutdown_workers()
 
 
 if __name__ == "__main__":